@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+from collections import namedtuple
+
+from apiclient import errors
+
+from crawler import TreeCrawler
+from drive import _shared_users_request, bulk_execute
+from execution import MAX_BATCH_SIZE, execute, execute_batch
+
+# Fields of the permissions compared by the reconciler
+PERMISSION_FIELDS = "id,type,role,emailAddress,domain,permissionDetails(inherited)"
+
+# Number of items whose permissions are fetched between two steps of the crawl
+FETCH_CHUNK_SIZE = 1000
+
+# One permission change on one item :
+# - action : "add", "update" or "remove"
+# - file_id, path : the item, path being relative to the root folder ("" for the root folder itself)
+# - type, target : grantee of the permission ("user", "a@b.com"), ("domain", "b.com"), ("anyone", "")
+# - role : role to give ("add", "update") or removed ("remove")
+# - permission_id : existing permission ("update", "remove"), None for "add"
+# - current_role : role before the change ("update"), None otherwise
+AclChange = namedtuple('AclChange', ['action', 'file_id', 'path', 'type', 'target', 'role', 'permission_id',
+                                     'current_role'])
+
+
+def _grantee(permission):
+    type_ = permission.get('type')
+    if type_ in ('user', 'group'):
+        return type_, (permission.get('emailAddress') or '').lower()
+    if type_ == 'domain':
+        return type_, (permission.get('domain') or '').lower()
+    return type_, ''
+
+
+def _is_inherited(permission):
+    # Inherited permissions (shared drives) can only be changed on the folder they come from
+    details = permission.get('permissionDetails') or []
+    return bool(details) and all(detail.get('inherited') for detail in details)
+
+
+def diff_permissions(file_id, path, current, desired, remove_unlisted=True):
+    """
+    Return the AclChange list turning the permissions 'current' (permissions.list resources) of an item
+    into 'desired' ({(type, target): role}, cf AclReconciler).
+    Owner and inherited permissions are never changed, and count as present.
+    """
+    changes = []
+    present = set()
+    for permission in current:
+        grantee = _grantee(permission)
+        role = permission.get('role')
+        if role == 'owner' or _is_inherited(permission):
+            present.add(grantee)
+        elif grantee in desired:
+            present.add(grantee)
+            if role != desired[grantee]:
+                changes.append(AclChange("update", file_id, path, grantee[0], grantee[1], desired[grantee],
+                                         permission['id'], role))
+        elif remove_unlisted:
+            changes.append(AclChange("remove", file_id, path, grantee[0], grantee[1], role, permission['id'], None))
+
+    for grantee, role in sorted(desired.items()):
+        if grantee not in present:
+            changes.append(AclChange("add", file_id, path, grantee[0], grantee[1], role, None, None))
+    return changes
+
+
+class AclReconciler(object):
+    """
+    Enforce a permission set on every item of a folder subtree, touching only what differs.
+        reconciler = AclReconciler(service, folder_id, [
+            {"type": "group", "emailAddress": "team@example.com", "role": "writer"},
+            {"type": "domain", "domain": "example.com", "role": "reader"},
+        ])
+        changes = reconciler.plan()
+        print(reconciler.report(changes))  # dry run
+        results = reconciler.apply(changes)
+    - desired : permissions every item must have (type, emailAddress or domain, role)
+    - remove_unlisted : remove the permissions not in 'desired' (owners and inherited permissions are kept)
+    - include_root : reconcile the root folder itself too
+    - send_notification : send an email to the users and groups added
+    The subtree is crawled with crawler.TreeCrawler, the permissions are fetched in batch requests while
+    crawling, and the changes are applied in batch requests too.
+    In My Drive, the permissions of a folder are propagated to its content, so the changes are applied
+    parents first (cf apply) : a change already made by propagation is skipped or not reported as an error.
+    Other changes planned against the state before propagation (an update of a propagated permission on a
+    child for example) are still sent : call plan() again after apply() to check that nothing is left.
+    """
+
+    def __init__(self, service, root_id, desired, remove_unlisted=True, include_root=True, send_notification=False,
+                 batch_size=MAX_BATCH_SIZE, **crawler_options):
+        self.service = service
+        self.root_id = root_id
+        self.desired = {}
+        for permission in desired:
+            if permission['role'] == 'owner':
+                raise ValueError("Ownership transfers are not supported, cf drive.change_owner")
+            self.desired[_grantee(permission)] = permission['role']
+        self.remove_unlisted = remove_unlisted
+        self.include_root = include_root
+        self.send_notification = send_notification
+        self.batch_size = batch_size
+        self.crawler_options = crawler_options
+        # (path, errors.HttpError) of the items whose permissions could not be fetched (they are skipped)
+        self.errors = []
+        # ID of each item crawled by the last plan() -> ID of the folder it was found in (cf TreeCrawler.parents)
+        self._parents = {}
+
+    def plan(self):
+        """
+        Crawl the subtree and return the list of AclChange to apply. Nothing is modified.
+        """
+        changes = []
+        chunk = [(self.root_id, "")] if self.include_root else []
+        crawler = TreeCrawler(self.service, self.root_id, fields="id, name, mimeType", **self.crawler_options)
+        for path, item in crawler:
+            chunk.append((item['id'], path))
+            if len(chunk) >= FETCH_CHUNK_SIZE:
+                changes.extend(self._diff_chunk(chunk))
+                chunk = []
+        changes.extend(self._diff_chunk(chunk))
+        self._parents = crawler.parents
+        return changes
+
+    def _ancestors(self, file_id):
+        # IDs of the folders containing 'file_id' in the subtree crawled by the last plan(), from its parent up
+        ancestors = []
+        while file_id in self._parents:
+            file_id = self._parents[file_id]
+            ancestors.append(file_id)
+        return ancestors
+
+    def _diff_chunk(self, items):
+        requests = [_shared_users_request(self.service, file_id, PERMISSION_FIELDS) for file_id, _ in items]
+        results = execute_batch(self.service, requests, batch_size=self.batch_size)
+
+        changes = []
+        permissions_resource = self.service.permissions()
+        for (file_id, path), request, (response, error) in zip(items, requests, results):
+            if error is not None:
+                self.errors.append((path, error))
+                continue
+            permissions = response.get('permissions', [])
+            # More than one page of permissions is rare : the next pages are fetched one by one
+            try:
+                next_request = permissions_resource.list_next(request, response)
+                while next_request is not None:
+                    response = execute(next_request)
+                    permissions.extend(response.get('permissions', []))
+                    next_request = permissions_resource.list_next(next_request, response)
+            except errors.HttpError as error:
+                self.errors.append((path, error))
+                continue
+            changes.extend(diff_permissions(file_id, path, permissions, self.desired, self.remove_unlisted))
+        return changes
+
+    def _operation(self, change):
+        if change.action == "add":
+            user = change.type in ('user', 'group')
+            return "share_file", {
+                'file_id': change.file_id,
+                'email': change.target if user else None,
+                'sendNotificationEmail': self.send_notification if user else None,
+                'role': change.role,
+                'type_': change.type,
+                'domain': change.target if change.type == 'domain' else None,
+            }
+        if change.action == "update":
+            return "update_permission", {'fileId': change.file_id, 'permissionId': change.permission_id,
+                                         'role': change.role}
+        return "delete_permission", {'fileId': change.file_id, 'permissionId': change.permission_id}
+
+    def apply(self, changes=None):
+        """
+        Apply 'changes' (the result of plan(), which is called if they are not given) through drive.bulk_execute.
+        Returns a list of (change, response, error) tuples in the same order as 'changes',
+        'error' being the errors.HttpError of the change or None.
+        The changes are applied one depth of the subtree after the other. An "add" already made on a folder
+        containing the item is skipped (response and error None), and a "remove" answered by a 404 after the
+        same permission was removed from a folder containing the item is not an error (it was propagated).
+        The folders containing an item are the ones it was found under by the last plan() : for changes
+        that do not come from it, every change is sent.
+        """
+        if changes is None:
+            changes = self.plan()
+
+        depths = {}
+        for index, change in enumerate(changes):
+            depths.setdefault(len(self._ancestors(change.file_id)), []).append(index)
+
+        results = [None] * len(changes)
+        # (file ID, action, type, target, role) of the changes made
+        done = set()
+        for depth in sorted(depths):
+            indexes = []
+            for index in depths[depth]:
+                change = changes[index]
+                key = (change.action, change.type, change.target, change.role)
+                if change.action == "add" and any((ancestor, ) + key in done
+                                                  for ancestor in self._ancestors(change.file_id)):
+                    results[index] = (change, None, None)
+                else:
+                    indexes.append(index)
+
+            # The Drive API does not support concurrent permission changes on the same file : each round of
+            # batch requests contains at most one change per file.
+            rounds = []
+            file_rounds = {}
+            for index in indexes:
+                number = file_rounds.get(changes[index].file_id, 0)
+                file_rounds[changes[index].file_id] = number + 1
+                if number == len(rounds):
+                    rounds.append([])
+                rounds[number].append(index)
+
+            for round_indexes in rounds:
+                responses = bulk_execute(self.service, [self._operation(changes[index]) for index in round_indexes],
+                                         batch_size=self.batch_size)
+                for index, (response, error) in zip(round_indexes, responses):
+                    change = changes[index]
+                    key = (change.action, change.type, change.target, change.role)
+                    if error is not None and change.action == "remove" and error.resp.status == 404 \
+                            and any((ancestor, ) + key in done for ancestor in self._ancestors(change.file_id)):
+                        error = None
+                    if error is None:
+                        done.add((change.file_id, ) + key)
+                    results[index] = (change, response, error)
+        return results
+
+    @staticmethod
+    def report(changes):
+        """
+        Text report of 'changes', one line per change, for a dry run.
+        """
+        lines = []
+        for change in changes:
+            grantee = "{}:{}".format(change.type, change.target) if change.target else change.type
+            role = change.role if change.action != "update" else "{} -> {}".format(change.current_role, change.role)
+            lines.append("{:<7} {:<40} {:<20} {}".format(change.action, grantee, role, change.path or "/"))
+        lines.append("{} change(s) on {} item(s)".format(len(changes), len(set(change.file_id for change in changes))))
+        return "\n".join(lines)
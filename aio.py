@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+import asyncio
+import time
+
+import aiohttp  # pip install aiohttp
+import google_auth_httplib2
+import httplib2
+from apiclient import errors
+
+import drive
+import metrics
+import sheets
+from execution import MAX_RETRIES, backoff_delay, default_limiter, is_rate_limited, is_retryable
+
+
+class AsyncClient(object):
+    """
+    Send googleapiclient requests (HttpRequest objects) on a pooled keep-alive aiohttp session,
+    for the async counterparts of the drive.py and sheets.py functions below. The requests are built
+    with the same services and request builders as the synchronous functions.
+        async with AsyncClient(limit_per_host=50) as client:
+            service = get_service(scopes, "drive")
+            files = await asyncio.gather(*[get_file_infos(client, service, file_id) for file_id in ids])
+    - limit : maximum number of open connections
+    - limit_per_host : maximum number of open connections to the same host
+    - limiter : execution.RateLimiter shared with the synchronous calls (default_limiter by default)
+    Throttled calls and 5xx errors are retried like execution.execute does.
+    """
+
+    def __init__(self, limit=100, limit_per_host=50, limiter=None, max_retries=MAX_RETRIES, timeout=120):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.limiter = limiter or default_limiter
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._session = None
+        self._refresh_locks = {}
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def execute(self, request):
+        """
+        Send 'request' (HttpRequest) and return its deserialized response, like request.execute().
+        Raises errors.HttpError on failure.
+        """
+        await self.open()
+        start = time.time()
+        retry = 0
+        while True:
+            delay = self.limiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            headers = dict(request.headers)
+            await self._authorize(request, headers)
+            async with self._session.request(request.method, request.uri, data=request.body,
+                                             headers=headers) as response:
+                content = await response.read()
+                resp = httplib2.Response(dict(response.headers, status=str(response.status)))
+
+            if resp.status < 300:
+                self.limiter.succeeded()
+                self._record(request, start, content, retry, resp.status)
+                return request.postproc(resp, content)
+
+            error = errors.HttpError(resp, content, uri=request.uri)
+            if is_rate_limited(error):
+                self.limiter.throttled()
+            if retry >= self.max_retries or not is_retryable(error):
+                self._record(request, start, content, retry, resp.status)
+                raise error
+            await asyncio.sleep(backoff_delay(retry))
+            retry += 1
+
+    @staticmethod
+    def _record(request, start, content, retries, status):
+        if metrics.has_hooks():
+            metrics.record(getattr(request, 'methodId', None), start, time.time() - start, len(content), retries,
+                           status)
+
+    async def _authorize(self, request, headers):
+        if not isinstance(request.http, google_auth_httplib2.AuthorizedHttp):
+            return
+        credentials = request.http.credentials
+        if not credentials.valid:
+            lock = self._refresh_locks.setdefault(id(credentials), asyncio.Lock())
+            async with lock:
+                if not credentials.valid:
+                    # google-auth only refreshes synchronously : done on a thread to not block the event loop
+                    transport = google_auth_httplib2.Request(httplib2.Http())
+                    await asyncio.get_event_loop().run_in_executor(None, credentials.refresh, transport)
+        credentials.apply(headers)
+
+
+# drive.py
+
+async def print_about(client, service, fields="*"):
+    return await client.execute(drive._about_request(service, fields))
+
+
+async def get_files(client, service, location="root", nb=100):
+    response = await client.execute(drive._get_files_request(service, location, nb))
+    return response.get('files', [])
+
+
+async def search_file(client, service, name, nb=100):
+    response = await client.execute(drive._search_file_request(service, name, nb))
+    return response.get('files', [])
+
+
+async def full_search_file(client, service, fulltext, nb=100):
+    response = await client.execute(drive._full_search_file_request(service, fulltext, nb))
+    return response.get('files', [])
+
+
+async def iter_files(client, service, query=None, fields=drive.DEFAULT_FILE_FIELDS, page_size=1000, order_by=None):
+    """
+    Async generator equivalent of drive.iter_files.
+    """
+    kwargs = {
+        'pageSize': page_size,
+        'fields': "nextPageToken, files({})".format(fields),
+    }
+    if query:
+        kwargs['q'] = query
+    if order_by:
+        kwargs['orderBy'] = order_by
+
+    files = service.files()
+    request = files.list(**kwargs)
+    while request is not None:
+        response = await client.execute(request)
+        for item in response.get('files', []):
+            yield item
+        request = files.list_next(request, response)
+
+
+async def trash_file(client, service, file_id):
+    return await client.execute(drive._trash_file_request(service, file_id))
+
+
+async def delete_file(client, service, file_id):
+    return await client.execute(drive._delete_file_request(service, file_id))
+
+
+async def create_folder(client, service, parent_id, foldername):
+    return await client.execute(drive._create_folder_request(service, parent_id, foldername))
+
+
+async def copy_file(client, service, origin_file, parents_list):
+    return await client.execute(drive._copy_file_request(service, origin_file, parents_list))
+
+
+async def rename_file(client, service, file_id, new_name):
+    return await client.execute(drive._rename_file_request(service, file_id, new_name))
+
+
+async def share_file(client, service, file_id, email, sendNotificationEmail, role, type_, domain=None):
+    return await client.execute(drive._share_file_request(service, file_id, email, sendNotificationEmail,
+                                                          role, type_, domain))
+
+
+async def get_shared_users(client, service, fileId, fields="id,emailAddress,role"):
+    permissions_resource = service.permissions()
+    request = drive._shared_users_request(service, fileId, fields)
+    permissions = []
+    while request is not None:
+        response = await client.execute(request)
+        permissions.extend(response.get('permissions', []))
+        request = permissions_resource.list_next(request, response)
+    return permissions
+
+
+async def update_permission(client, service, fileId, permissionId, role):
+    return await client.execute(drive._update_permission_request(service, fileId, permissionId, role))
+
+
+async def delete_permission(client, service, fileId, permissionId):
+    await client.execute(drive._delete_permission_request(service, fileId, permissionId))
+
+
+async def add_parent(client, service, file_id, parent_id):
+    return await client.execute(drive._add_parent_request(service, file_id, parent_id))
+
+
+async def get_file_infos(client, service, file_id):
+    return await client.execute(drive._file_infos_request(service, file_id))
+
+
+async def change_owner(client, service, file_id, email):
+    return await client.execute(drive._change_owner_request(service, file_id, email))
+
+
+# sheets.py
+
+async def _batch_update(client, service, spreadsheet_id, requests):
+    return await client.execute(service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id,
+                                                                   body={'requests': requests}))
+
+
+async def spreadsheet_update_cells(client, service, spreadsheetId, range_, valuesList):
+    return await client.execute(sheets._update_cells_request(service, spreadsheetId, range_, valuesList))
+
+
+async def protect_spreadsheet_element(client, service, sheet_id, spreadsheet_id, warningOnly, requestingUserCanEdit,
+                                      UsersList=[], **kwargs):
+    return await _batch_update(client, service, spreadsheet_id,
+                               [sheets._protect_request(sheet_id, warningOnly, requestingUserCanEdit, UsersList,
+                                                        kwargs.get("position"))])
+
+
+async def hide_spreadsheet_column(client, service, spreadsheet_id, sheet_id, column_index, hiddenByUser):
+    return await _batch_update(client, service, spreadsheet_id,
+                               [sheets._hide_columns_request(sheet_id, column_index, column_index + 1,
+                                                             hiddenByUser)])
+
+
+async def get_spreadsheet_info(client, service, spreadsheet_id, ranges, include_grid_data=True, fields=None):
+    return await client.execute(sheets._spreadsheet_info_request(service, spreadsheet_id, ranges,
+                                                                 include_grid_data, fields))
+
+
+async def get_spreadsheet_values(client, service, spreadsheet_id, ranges, value_render_option='UNFORMATTED_VALUE',
+                                 columnar=False):
+    response = await client.execute(sheets._values_request(service, spreadsheet_id, ranges, value_render_option))
+    return sheets._values_from_response(response, columnar)
+
+
+async def add_spreadsheet_sheet(client, service, spreadsheet_id, sheet_name, column_nb, row_nb):
+    return await _batch_update(client, service, spreadsheet_id,
+                               [sheets._add_sheet_request(sheet_name, column_nb, row_nb)])
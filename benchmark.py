@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# coding: utf8
+"""
+Throughput and latency of the drive.py and sheets.py functions against the local fake
+Drive/Sheets server (fakegoogle.py) : no Google account needed.
+    python benchmark.py
+    python benchmark.py --latency 0.05 --error-rate 0.02 --repeat 50 --only drive.
+    python benchmark.py --json > before.json
+"""
+
+from __future__ import print_function
+import argparse
+import io
+import json
+import sys
+import time
+
+import drive
+import execution
+import sheets
+import transfer
+from crawler import TreeCrawler
+from fakegoogle import FOLDER_MIME_TYPE, FakeGoogle
+from index import DriveIndex
+
+
+def _folder_with_files(fake, nb, content=None):
+    folder_id = fake.add_file("folder", mime_type=FOLDER_MIME_TYPE)
+    return folder_id, [fake.add_file("file {}".format(i), folder_id, content=content) for i in range(nb)]
+
+
+def _tree(fake, depth, width, files, parent_id="root"):
+    folder_id = fake.add_file("folder", parent_id, mime_type=FOLDER_MIME_TYPE)
+    for i in range(files):
+        fake.add_file("file {}".format(i), folder_id)
+    if depth > 1:
+        for _ in range(width):
+            _tree(fake, depth - 1, width, files, folder_id)
+    return folder_id
+
+
+# Each case gets (fake, drive service, sheets service, size) and returns the function called on each iteration
+def _print_about(fake, service, _, size):
+    return lambda: drive.print_about(service)
+
+
+def _get_files(fake, service, _, size):
+    for i in range(size):
+        fake.add_file("file {}".format(i))
+    return lambda: drive.get_files(service, "root", nb=size)
+
+
+def _search_file(fake, service, _, size):
+    _folder_with_files(fake, size)
+    return lambda: drive.search_file(service, "file 1", nb=size)
+
+
+def _full_search_file(fake, service, _, size):
+    _folder_with_files(fake, size)
+    return lambda: drive.full_search_file(service, "file", nb=size)
+
+
+def _iter_files(fake, service, _, size):
+    folder_id, _ = _folder_with_files(fake, size * 10)
+    return lambda: list(drive.iter_files(service, "'{}' in parents".format(folder_id), page_size=size))
+
+
+def _trash_file(fake, service, _, size):
+    folder_id, _ = _folder_with_files(fake, 0)
+    return lambda: drive.trash_file(service, fake.add_file("file", folder_id))
+
+
+def _delete_file(fake, service, _, size):
+    folder_id, _ = _folder_with_files(fake, 0)
+    return lambda: drive.delete_file(service, fake.add_file("file", folder_id))
+
+
+def _create_folder(fake, service, _, size):
+    folder_id, _ = _folder_with_files(fake, 0)
+    return lambda: drive.create_folder(service, folder_id, "folder")
+
+
+def _copy_file(fake, service, _, size):
+    folder_id, file_ids = _folder_with_files(fake, 1, content=b"x" * 1024)
+    return lambda: drive.copy_file(service, {'id': file_ids[0], 'name': "copy"}, [folder_id])
+
+
+def _rename_file(fake, service, _, size):
+    _, file_ids = _folder_with_files(fake, 1)
+    return lambda: drive.rename_file(service, file_ids[0], "renamed")
+
+
+def _mkdir_gdrive(fake, service, _, size):
+    folder_id, _ = _folder_with_files(fake, 0)
+    tree = {"folder {}".format(i): {"sub folder {}".format(j): {} for j in range(3)} for i in range(size)}
+    return lambda: drive.mkdir_gdrive(service, tree, folder_id)
+
+
+def _share_file(fake, service, _, size):
+    _, file_ids = _folder_with_files(fake, 1)
+    return lambda: drive.share_file(service, file_ids[0], "user@example.com", False, "reader", "user")
+
+
+def _get_shared_users(fake, service, _, size):
+    _, file_ids = _folder_with_files(fake, 1)
+    for i in range(size):
+        drive.share_file(service, file_ids[0], "user{}@example.com".format(i), False, "reader", "user")
+    return lambda: drive.get_shared_users(service, file_ids[0])
+
+
+def _delete_permission(fake, service, _, size):
+    _, file_ids = _folder_with_files(fake, 1)
+
+    def run():
+        permission = drive.share_file(service, file_ids[0], "user@example.com", False, "reader", "user")
+        drive.delete_permission(service, file_ids[0], permission['id'])
+    return run
+
+
+def _duplicate_tree(fake, service, _, size):
+    source_id = _tree(fake, 3, 3, size // 10 or 1)
+    folder_id, _ = _folder_with_files(fake, 0)
+    source = drive.get_file_infos(service, source_id)
+    return lambda: drive.duplicate_tree(service, [source], folder_id, [])
+
+
+def _add_parent(fake, service, _, size):
+    folder_id, file_ids = _folder_with_files(fake, 1)
+    return lambda: drive.add_parent(service, file_ids[0], folder_id)
+
+
+def _get_file_infos(fake, service, _, size):
+    _, file_ids = _folder_with_files(fake, 1)
+    return lambda: drive.get_file_infos(service, file_ids[0])
+
+
+def _change_owner(fake, service, _, size):
+    _, file_ids = _folder_with_files(fake, 1)
+    return lambda: drive.change_owner(service, file_ids[0], "owner@example.com")
+
+
+def _bulk_execute(fake, service, _, size):
+    _, file_ids = _folder_with_files(fake, size)
+    operations = [("rename_file", {'file_id': file_id, 'new_name': "renamed"}) for file_id in file_ids]
+    return lambda: drive.bulk_execute(service, operations)
+
+
+def _tree_crawler(fake, service, _, size):
+    root_id = _tree(fake, 3, 4, size // 10 or 1)
+    return lambda: list(TreeCrawler(service, root_id, page_size=size))
+
+
+def _drive_index_build(fake, service, _, size):
+    _tree(fake, 3, 4, size // 10 or 1)
+    return lambda: DriveIndex().build(service)
+
+
+def _drive_index_update(fake, service, _, size):
+    _, file_ids = _folder_with_files(fake, size)
+    index = DriveIndex()
+    index.build(service)
+
+    def run():
+        drive.bulk_execute(service, [("rename_file", {'file_id': file_id, 'new_name': "renamed"})
+                                     for file_id in file_ids])
+        index.update(service)
+    return run
+
+
+def _upload_file(fake, service, _, size):
+    folder_id, _ = _folder_with_files(fake, 0)
+    content = b"x" * (size * 1024 * 10)
+    return lambda: transfer.upload_file(service, io.BytesIO(content), "upload", folder_id, chunk_size=256 * 1024)
+
+
+def _upload_files(fake, service, _, size):
+    # Several chunks per file, sent from the worker threads (execution.thread_http transports)
+    folder_id, _ = _folder_with_files(fake, 0)
+    content = b"x" * (3 * 256 * 1024 + 1)
+    items = [{'source': io.BytesIO(content), 'name': "upload {}".format(i), 'parent_id': folder_id,
+              'chunk_size': 256 * 1024} for i in range(4)]
+
+    def run():
+        for item in items:
+            item['source'].seek(0)
+        for _, error in transfer.upload_files(service, items):
+            if error is not None:
+                raise error
+    return run
+
+
+def _download_file(fake, service, _, size):
+    _, file_ids = _folder_with_files(fake, 1, content=b"x" * (size * 1024 * 10))
+    return lambda: transfer.download_file(service, file_ids[0], io.BytesIO(), chunk_size=256 * 1024)
+
+
+def _spreadsheet_update_cells(fake, _, service, size):
+    spreadsheet_id = fake.add_spreadsheet()
+    return lambda: sheets.spreadsheet_update_cells(service, spreadsheet_id, "Sheet1!A1", list(range(size)))
+
+
+def _spreadsheet_write_rows(fake, _, service, size):
+    spreadsheet_id = fake.add_spreadsheet(sheets=(("Sheet1", size * 10, 10),))
+    rows = [{"col {}".format(j): i * j for j in range(10)} for i in range(size * 10)]
+    return lambda: sheets.spreadsheet_write_rows(service, spreadsheet_id, "Sheet1!A1", rows)
+
+
+def _protect_spreadsheet_element(fake, _, service, size):
+    spreadsheet_id = fake.add_spreadsheet()
+    return lambda: sheets.protect_spreadsheet_element(service, 0, spreadsheet_id, True, True)
+
+
+def _hide_spreadsheet_column(fake, _, service, size):
+    spreadsheet_id = fake.add_spreadsheet()
+    return lambda: sheets.hide_spreadsheet_column(service, spreadsheet_id, 0, 1, True)
+
+
+def _spreadsheet_with_values(fake, service, size):
+    spreadsheet_id = fake.add_spreadsheet(sheets=(("Sheet1", size * 10, 10),))
+    sheets.spreadsheet_write_rows(service, spreadsheet_id, "Sheet1!A1",
+                                  [[i * j for j in range(10)] for i in range(size * 10)], header=False)
+    return spreadsheet_id
+
+
+def _get_spreadsheet_info(fake, _, service, size):
+    spreadsheet_id = _spreadsheet_with_values(fake, service, size)
+    return lambda: sheets.get_spreadsheet_info(service, spreadsheet_id, ["Sheet1!A1:J{}".format(size)])
+
+
+def _get_spreadsheet_values(fake, _, service, size):
+    spreadsheet_id = _spreadsheet_with_values(fake, service, size)
+    return lambda: sheets.get_spreadsheet_values(service, spreadsheet_id, ["Sheet1!A1:J{}".format(size * 10)])
+
+
+def _iter_spreadsheet_values(fake, _, service, size):
+    spreadsheet_id = _spreadsheet_with_values(fake, service, size)
+    return lambda: list(sheets.iter_spreadsheet_values(service, spreadsheet_id, "Sheet1!A1:J", block_rows=size))
+
+
+def _add_spreadsheet_sheet(fake, _, service, size):
+    spreadsheet_id = fake.add_spreadsheet()
+    return lambda: sheets.add_spreadsheet_sheet(service, spreadsheet_id, "sheet", 10, size)
+
+
+def _spreadsheet_batch(fake, _, service, size):
+    spreadsheet_id = fake.add_spreadsheet()
+
+    def run():
+        with sheets.SpreadsheetBatch(service, spreadsheet_id) as batch:
+            for column in range(size):
+                batch.hide_column(0, column, True)
+            batch.protect(0, True, True)
+    return run
+
+
+def _spreadsheet_appender(fake, _, service, size):
+    spreadsheet_id = fake.add_spreadsheet()
+
+    def run():
+        with sheets.SpreadsheetAppender(service, spreadsheet_id, "Sheet1!A1", max_rows=size) as appender:
+            for i in range(size * 10):
+                appender.append([i, i * 2, i * 3])
+    return run
+
+
+CASES = [
+    ("drive.print_about", _print_about),
+    ("drive.get_files", _get_files),
+    ("drive.search_file", _search_file),
+    ("drive.full_search_file", _full_search_file),
+    ("drive.iter_files", _iter_files),
+    ("drive.trash_file", _trash_file),
+    ("drive.delete_file", _delete_file),
+    ("drive.create_folder", _create_folder),
+    ("drive.copy_file", _copy_file),
+    ("drive.rename_file", _rename_file),
+    ("drive.mkdir_gdrive", _mkdir_gdrive),
+    ("drive.share_file", _share_file),
+    ("drive.get_shared_users", _get_shared_users),
+    ("drive.delete_permission", _delete_permission),
+    ("drive.duplicate_tree", _duplicate_tree),
+    ("drive.add_parent", _add_parent),
+    ("drive.get_file_infos", _get_file_infos),
+    ("drive.change_owner", _change_owner),
+    ("drive.bulk_execute", _bulk_execute),
+    ("crawler.TreeCrawler", _tree_crawler),
+    ("index.DriveIndex.build", _drive_index_build),
+    ("index.DriveIndex.update", _drive_index_update),
+    ("transfer.upload_file", _upload_file),
+    ("transfer.upload_files", _upload_files),
+    ("transfer.download_file", _download_file),
+    ("sheets.spreadsheet_update_cells", _spreadsheet_update_cells),
+    ("sheets.spreadsheet_write_rows", _spreadsheet_write_rows),
+    ("sheets.protect_spreadsheet_element", _protect_spreadsheet_element),
+    ("sheets.hide_spreadsheet_column", _hide_spreadsheet_column),
+    ("sheets.get_spreadsheet_info", _get_spreadsheet_info),
+    ("sheets.get_spreadsheet_values", _get_spreadsheet_values),
+    ("sheets.iter_spreadsheet_values", _iter_spreadsheet_values),
+    ("sheets.add_spreadsheet_sheet", _add_spreadsheet_sheet),
+    ("sheets.SpreadsheetBatch", _spreadsheet_batch),
+    ("sheets.SpreadsheetAppender", _spreadsheet_appender),
+]
+
+
+def _percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))]
+
+
+def run_case(fake, setup, repeat, size):
+    """
+    Call the function of the case 'repeat' times (after one warm-up call) and return its statistics :
+    calls per second, latency (seconds) percentiles and HTTP requests received by the fake server per call.
+    """
+    function = setup(fake, fake.service("drive"), fake.service("sheets"), size)
+    function()
+
+    latencies = []
+    requests = fake.requests
+    start = time.time()
+    for _ in range(repeat):
+        call_start = time.time()
+        function()
+        latencies.append(time.time() - call_start)
+    elapsed = time.time() - start
+
+    return {
+        'calls': repeat,
+        'calls_per_second': repeat / elapsed if elapsed else 0.0,
+        'mean': sum(latencies) / len(latencies),
+        'p50': _percentile(latencies, 50),
+        'p95': _percentile(latencies, 95),
+        'max': max(latencies),
+        'requests_per_call': (fake.requests - requests) / float(repeat),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added by the fake server to each HTTP request")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="probability for a request to be answered by a rate limit error")
+    parser.add_argument("--page-size", type=int, default=1000,
+                        help="maximum number of files per files.list page")
+    parser.add_argument("--repeat", type=int, default=20, help="measured calls per function")
+    parser.add_argument("--size", type=int, default=100,
+                        help="size of the data of each case (files, rows...)")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="calls per second allowed by execution.default_limiter")
+    parser.add_argument("--only", default="", help="only run the cases whose name starts with this prefix")
+    parser.add_argument("--json", action="store_true", help="print the results in JSON")
+    args = parser.parse_args(argv)
+
+    # The default limiter (10 calls/s) would hide the cost of the library itself
+    limiter = execution.default_limiter
+    limiter.rate = limiter.burst = limiter.max_rate = args.rate
+
+    results = {}
+    for name, setup in CASES:
+        if not name.startswith(args.only):
+            continue
+        with FakeGoogle(latency=args.latency, error_rate=args.error_rate, max_page_size=args.page_size) as fake:
+            results[name] = run_case(fake, setup, args.repeat, args.size)
+        if not args.json:
+            result = results[name]
+            print("{:<38} {:>9.1f} calls/s  mean {:>8.2f} ms  p50 {:>8.2f} ms  p95 {:>8.2f} ms  "
+                  "{:>6.1f} requests/call".format(name, result['calls_per_second'], result['mean'] * 1000,
+                                                  result['p50'] * 1000, result['p95'] * 1000,
+                                                  result['requests_per_call']))
+            sys.stdout.flush()
+
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
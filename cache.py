@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from apiclient import errors
+
+from execution import execute
+
+
+def _identity(http):
+    """
+    Return the (service account, impersonated user) the calls of 'http' are made as, so a response fetched
+    for one user is never served to another one. (None, None) for other credentials.
+    """
+    credentials = getattr(http, 'credentials', None)
+    return getattr(credentials, 'service_account_email', None), getattr(credentials, '_subject', None)
+
+
+class ResponseCache(object):
+    """
+    Opt-in cache of API responses (get_file_infos, print_about, get_spreadsheet_info...), keyed by
+    caller, API method and request URI, so by resource and fields mask. The caller is the service account
+    and the impersonated user of the credentials (cf services.get_service) : with other credentials,
+    use one cache per user.
+    A cached response is revalidated before being served again :
+    - with its ETag (If-None-Match header) : a 304 answer is served from memory,
+    - else with 'revalidate', a function given by the caller that checks cheaply if the cached response
+    is still current (for example the "version" of a Drive file, cf drive.get_file_infos).
+    Responses younger than 'max_age' seconds are served without revalidation.
+    Entries unused for 'ttl' seconds are evicted, and the least recently used ones are evicted when the
+    responses take more than 'max_bytes' bytes (size of their JSON).
+        cache = ResponseCache(max_bytes=32 * 1024 * 1024)
+        infos = get_file_infos(service, file_id, cache=cache)
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=3600, max_age=0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_age = max_age
+        self.size = 0
+        # Responses served without request, after a revalidation, and fetched entirely
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (JSON of the response, ETag, time stored, time last used), from the least to the most recently used
+        self._entries = OrderedDict()
+
+    def execute(self, request, http=None, revalidate=None):
+        """
+        Return the response of 'request' (HttpRequest), from the cache when it is still current,
+        else executed with execution.execute and stored.
+        - revalidate : optional function called with the cached response when it has no ETag,
+        returning True if it is still current
+        """
+        key = (_identity(http or request.http), getattr(request, 'methodId', None), request.uri)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and now - entry[3] > self.ttl:
+                self.size -= len(entry[0])
+                entry = None
+            if entry is not None:
+                self._entries[key] = entry[:3] + (now,)
+
+        if entry is not None:
+            content, etag, stored, _ = entry
+            if now - stored <= self.max_age:
+                with self._lock:
+                    self.hits += 1
+                return json.loads(content)
+            if etag is None and revalidate is not None and revalidate(json.loads(content)):
+                self._store(key, content, etag, 'revalidations')
+                return json.loads(content)
+            if etag is not None:
+                request.headers['If-None-Match'] = etag
+
+        response_etag = {}
+        postproc = request.postproc
+
+        def capture(resp, content):
+            response_etag['etag'] = resp.get('etag')
+            return postproc(resp, content)
+
+        request.postproc = capture
+        try:
+            response = execute(request, http=http)
+        except errors.HttpError as error:
+            if error.resp.status != 304 or entry is None:
+                raise error
+            self._store(key, entry[0], entry[1], 'revalidations')
+            return json.loads(entry[0])
+        finally:
+            request.postproc = postproc
+            request.headers.pop('If-None-Match', None)
+
+        self._store(key, json.dumps(response), response_etag.get('etag'), 'misses')
+        return response
+
+    def _store(self, key, content, etag, counter):
+        now = time.time()
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            if len(content) > self.max_bytes:
+                return
+            self._entries[key] = (content, etag, now, now)
+            self.size += len(content)
+            # entries are ordered from the least to the most recently used
+            while self._entries:
+                oldest_key, (oldest_content, _, _, last_used) = next(iter(self._entries.items()))
+                if self.size <= self.max_bytes and now - last_used <= self.ttl:
+                    break
+                del self._entries[oldest_key]
+                self.size -= len(oldest_content)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# coding: utf8
+"""
+Run a JSONL stream of drive.py / sheets.py operations and write one JSONL result per operation.
+    python cli.py --input operations.jsonl --output results.jsonl --workers 16
+    cat operations.jsonl | python cli.py > results.jsonl
+Each input line is {"id": ..., "op": "trash_file", "args": {"file_id": "..."}, "user": "a@example.com"}
+("user", optional, is the user to impersonate). Each output line is
+{"id": ..., "op": ..., "ok": true, "result": ...} or {"id": ..., "op": ..., "ok": false, "error": {...}}.
+"""
+
+from __future__ import print_function
+import argparse
+import io
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_SCOPES = ["https://www.googleapis.com/auth/drive", "https://www.googleapis.com/auth/spreadsheets"]
+
+# Events read by Runner.run besides the input lines : end of the input, and a call completed
+_END = object()
+_DONE = object()
+
+# Operations accepted in the input : name -> (API, module, function). The modules are only imported
+# when the first operation needing them is read, so the runner starts fast.
+OPERATIONS = {
+    'print_about': ('drive', 'drive', 'print_about'),
+    'get_files': ('drive', 'drive', 'get_files'),
+    'search_file': ('drive', 'drive', 'search_file'),
+    'full_search_file': ('drive', 'drive', 'full_search_file'),
+    'trash_file': ('drive', 'drive', 'trash_file'),
+    'delete_file': ('drive', 'drive', 'delete_file'),
+    'create_folder': ('drive', 'drive', 'create_folder'),
+    'copy_file': ('drive', 'drive', 'copy_file'),
+    'rename_file': ('drive', 'drive', 'rename_file'),
+    'mkdir_gdrive': ('drive', 'drive', 'mkdir_gdrive'),
+    'share_file': ('drive', 'drive', 'share_file'),
+    'get_shared_users': ('drive', 'drive', 'get_shared_users'),
+    'update_permission': ('drive', 'drive', 'update_permission'),
+    'delete_permission': ('drive', 'drive', 'delete_permission'),
+    'add_parent': ('drive', 'drive', 'add_parent'),
+    'get_file_infos': ('drive', 'drive', 'get_file_infos'),
+    'change_owner': ('drive', 'drive', 'change_owner'),
+    'upload_file': ('drive', 'transfer', 'upload_file'),
+    'download_file': ('drive', 'transfer', 'download_file'),
+    'spreadsheet_update_cells': ('sheets', 'sheets', 'spreadsheet_update_cells'),
+    'spreadsheet_write_rows': ('sheets', 'sheets', 'spreadsheet_write_rows'),
+    'protect_spreadsheet_element': ('sheets', 'sheets', 'protect_spreadsheet_element'),
+    'hide_spreadsheet_column': ('sheets', 'sheets', 'hide_spreadsheet_column'),
+    'get_spreadsheet_info': ('sheets', 'sheets', 'get_spreadsheet_info'),
+    'get_spreadsheet_values': ('sheets', 'sheets', 'get_spreadsheet_values'),
+    'add_spreadsheet_sheet': ('sheets', 'sheets', 'add_spreadsheet_sheet'),
+}
+
+# Operations of drive.BULK_OPERATIONS, sent through batch requests (listed here so that drive is not imported
+# before the first batch)
+BULK_OPERATIONS = frozenset(['share_file', 'update_permission', 'delete_permission', 'trash_file', 'delete_file',
+                             'rename_file', 'add_parent'])
+
+
+def _error(error):
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return {'type': type(error).__name__, 'status': status, 'message': str(error)}
+
+
+def _result(entry, result=None, error=None):
+    line = {'id': entry.get('id'), 'op': entry.get('op')}
+    if error is None:
+        line.update(ok=True, result=result)
+    else:
+        line.update(ok=False, error=_error(error))
+    return line
+
+
+class Runner(object):
+    """
+    Schedule the operations : the ones of BULK_OPERATIONS are grouped by user in batch
+    requests of 'batch_size' operations, the others are run one by one, and up to 'workers' calls
+    (single or batch) run at the same time. Services come from services.get_service (cached by thread and user).
+    A batch is sent before being full when its first operation waits for more than 'batch_delay' seconds,
+    when no call is running and no operation is waiting to be read (slow input), or when more than
+    'max_buffered' operations wait in the batches (the oldest batch is sent).
+    """
+
+    def __init__(self, scopes, workers=8, batch_size=100, user_email=None, batch_delay=0.5, max_buffered=1000):
+        self.scopes = scopes
+        self.workers = workers
+        self.batch_size = batch_size
+        self.user_email = user_email
+        self.batch_delay = batch_delay
+        self.max_buffered = max_buffered
+        self._functions = {}
+
+    def _service(self, api, user_email):
+        from services import get_service
+        return get_service(self.scopes, api, user_email=user_email or self.user_email)
+
+    def _function(self, op):
+        if op not in self._functions:
+            import importlib
+            _, module, name = OPERATIONS[op]
+            self._functions[op] = getattr(importlib.import_module(module), name)
+        return self._functions[op]
+
+    def _run_one(self, entry):
+        try:
+            api = OPERATIONS[entry['op']][0]
+            function = self._function(entry['op'])
+            return [_result(entry, function(self._service(api, entry.get('user')), **entry.get('args', {})))]
+        except Exception as error:
+            return [_result(entry, error=error)]
+
+    def _run_batch(self, user_email, entries):
+        import drive
+        from execution import MAX_BATCH_SIZE, execute_batch
+        try:
+            service = self._service('drive', user_email)
+        except Exception as error:
+            return [_result(entry, error=error) for entry in entries]
+
+        # Requests are built first : invalid arguments only fail their operation, before anything is sent
+        results = [None] * len(entries)
+        requests = []
+        indexes = []
+        for index, entry in enumerate(entries):
+            try:
+                requests.append(drive.BULK_OPERATIONS[entry['op']](service, **entry.get('args', {})))
+                indexes.append(index)
+            except (TypeError, ValueError) as error:
+                results[index] = _result(entry, error=error)
+
+        try:
+            responses = execute_batch(service, requests, batch_size=min(self.batch_size, MAX_BATCH_SIZE))
+        except Exception as error:
+            # Some operations may have been applied : none is replayed, the error is reported for all of them
+            responses = [(None, error)] * len(requests)
+        for index, (response, error) in zip(indexes, responses):
+            results[index] = _result(entries[index], response, error)
+        return results
+
+    def run(self, lines):
+        """
+        Generator yielding the result (dict) of each operation of 'lines' (JSONL), as soon as it is known.
+        'lines' is read by another thread, so waiting batches are sent on time even when the input is slow.
+        """
+        # Lines read ahead and completed calls, in the order they happen
+        events = queue.Queue()
+        read_ahead = threading.Semaphore(max(self.batch_size, self.workers))
+
+        def read():
+            try:
+                for number, line in enumerate(lines, 1):
+                    read_ahead.acquire()
+                    events.put((number, line))
+            except Exception as error:
+                events.put(error)
+                return
+            events.put(_END)
+
+        threading.Thread(target=read, name="cli-reader", daemon=True).start()
+
+        batches = {}
+        started = {}
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+
+            def submit(function, *args):
+                future = executor.submit(function, *args)
+                in_flight.add(future)
+                future.add_done_callback(lambda _: events.put(_DONE))
+
+            def send(user_email):
+                del started[user_email]
+                submit(self._run_batch, user_email, batches.pop(user_email))
+
+            def completed():
+                for future in [future for future in in_flight if future.done()]:
+                    in_flight.discard(future)
+                    for result in future.result():
+                        yield result
+
+            while True:
+                for result in completed():
+                    yield result
+
+                # The input is not read further while too many calls are waiting (backpressure)
+                if len(in_flight) >= 2 * self.workers:
+                    wait(in_flight, return_when=FIRST_COMPLETED)
+                    continue
+
+                try:
+                    event = events.get_nowait()
+                except queue.Empty:
+                    if batches and not in_flight:
+                        # Idle pool and nothing to read : waiting for more operations would only add latency
+                        for user_email in list(batches):
+                            send(user_email)
+                        continue
+                    timeout = None
+                    if batches:
+                        timeout = max(0, min(started.values()) + self.batch_delay - time.time())
+                    try:
+                        event = events.get(timeout=timeout)
+                    except queue.Empty:
+                        now = time.time()
+                        for user_email in [user for user in batches if now - started[user] >= self.batch_delay]:
+                            send(user_email)
+                        continue
+
+                if event is _DONE:
+                    continue
+                if event is _END:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+
+                number, line = event
+                read_ahead.release()
+                if not line.strip():
+                    continue
+                entry = {'id': number}
+                try:
+                    entry = json.loads(line)
+                    if not isinstance(entry, dict) or not isinstance(entry.get('op'), str) \
+                            or entry['op'] not in OPERATIONS:
+                        raise ValueError("Unknown operation in line {}".format(number))
+                except ValueError as error:
+                    yield _result(entry if isinstance(entry, dict) else {'id': number}, error=error)
+                    continue
+
+                if entry['op'] in BULK_OPERATIONS and self.batch_size > 1:
+                    user_email = entry.get('user')
+                    batches.setdefault(user_email, []).append(entry)
+                    started.setdefault(user_email, time.time())
+                    if len(batches[user_email]) >= self.batch_size:
+                        send(user_email)
+                    elif sum(len(batch) for batch in batches.values()) > self.max_buffered:
+                        send(min(started, key=started.get))
+                else:
+                    submit(self._run_one, entry)
+
+            for user_email in list(batches):
+                send(user_email)
+            while in_flight:
+                wait(in_flight, return_when=FIRST_COMPLETED)
+                for result in completed():
+                    yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default="-", help="JSONL file of operations, '-' for stdin (default)")
+    parser.add_argument("--output", default="-", help="JSONL file of results, '-' for stdout (default)")
+    parser.add_argument("--workers", type=int, default=8, help="calls run at the same time")
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="operations per batch request for the operations of drive.BULK_OPERATIONS "
+                             "(1 to disable batching)")
+    parser.add_argument("--batch-delay", type=float, default=0.5,
+                        help="seconds an operation waits for its batch to be full before it is sent anyway")
+    parser.add_argument("--max-buffered", type=int, default=1000,
+                        help="operations waiting in the batches of all the users at most")
+    parser.add_argument("--scopes", nargs="+", default=DEFAULT_SCOPES)
+    parser.add_argument("--user-email", help="user to impersonate when an operation has no 'user'")
+    parser.add_argument("--credentials", help="service account credentials file "
+                                              "(services.SERVICE_ACCOUNT_CREDENTIALS_FILE by default)")
+    parser.add_argument("--rate", type=float, help="initial calls per second of execution.default_limiter")
+    parser.add_argument("--list", action="store_true", help="list the available operations and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(sorted(OPERATIONS)))
+        return 0
+
+    if args.credentials:
+        import services
+        services.SERVICE_ACCOUNT_CREDENTIALS_FILE = args.credentials
+    if args.rate:
+        from execution import default_limiter
+        default_limiter.rate = args.rate
+
+    source = sys.stdin if args.input == "-" else io.open(args.input, encoding='utf-8')
+    output = sys.stdout if args.output == "-" else io.open(args.output, 'w', encoding='utf-8')
+    failures = 0
+    try:
+        runner = Runner(args.scopes, workers=args.workers, batch_size=args.batch_size, user_email=args.user_email,
+                        batch_delay=args.batch_delay, max_buffered=args.max_buffered)
+        for result in runner.run(source):
+            failures += not result['ok']
+            output.write(json.dumps(result, default=str) + "\n")
+            output.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
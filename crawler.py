@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from apiclient import errors
+
+from drive import DEFAULT_FILE_FIELDS, FOLDER_MIME_TYPE, escape_query_value
+from execution import execute, thread_http
+
+# Fields the crawler needs for each file, added to the fields asked by the caller
+REQUIRED_FIELDS = ("id", "name", "mimeType", "parents")
+
+
+def _split_fields(fields):
+    """
+    Split a fields mask on its top-level commas : "id, owners(emailAddress, role)" -> ["id", "owners(...)"]
+    """
+    parts = []
+    depth = 0
+    current = ""
+    for char in fields:
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current += char
+    parts.append(current.strip())
+    return [part for part in parts if part]
+
+
+class TreeCrawler(object):
+    """
+    Recursive listing of every item under the folder 'root_id'.
+    Instead of one query per folder, up to 'folders_per_query' folders are listed by a single query
+    ("'a' in parents or 'b' in parents ..."), and up to 'max_workers' queries run at the same time.
+    Iterating over the crawler yields (path, file) tuples, path being relative to 'root_id'
+    ("folder/sub folder/file name"), as soon as their page is received. Along the way, 'paths'
+    maps the path of each crawled item to its ID, and 'parents' the ID of each crawled item to the ID
+    of the folder it was found in ('root_id' as given for the items of the root folder).
+        crawler = TreeCrawler(service, folder_id, fields="id, name, mimeType, md5Checksum")
+        for path, item in crawler:
+            ...
+        crawler.paths["docs/report.pdf"]
+    If several items of a folder have the same name, 'paths' keeps the last one.
+    """
+
+    def __init__(self, service, root_id, fields=DEFAULT_FILE_FIELDS, query="trashed = false",
+                 folders_per_query=50, max_workers=4, page_size=1000):
+        self.service = service
+        self.root_id = root_id
+        fields = _split_fields(fields)
+        self.fields = ", ".join(fields + [field for field in REQUIRED_FIELDS if field not in fields])
+        self.query = query
+        self.folders_per_query = folders_per_query
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.paths = {}
+        self.parents = {}
+
+    def __iter__(self):
+        root_id = self.root_id
+        if root_id == 'root':
+            # The items list the ID of the root folder in their parents, not the 'root' alias
+            try:
+                root_id = execute(self.service.files().get(fileId='root', fields='id'))['id']
+            except errors.HttpError as error:
+                raise error
+        folder_paths = {root_id: ""}
+        pending = deque([root_id])
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or in_flight:
+                while pending and len(in_flight) < self.max_workers:
+                    chunk = [pending.popleft() for _ in range(min(self.folders_per_query, len(pending)))]
+                    in_flight[executor.submit(self._list, chunk, None)] = chunk
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = in_flight.pop(future)
+                    try:
+                        response = future.result()
+                    except errors.HttpError as error:
+                        raise error
+
+                    if 'nextPageToken' in response:
+                        in_flight[executor.submit(self._list, chunk, response['nextPageToken'])] = chunk
+
+                    for item in response.get('files', []):
+                        parent_id = next(parent_id for parent_id in item.get('parents', [])
+                                         if parent_id in folder_paths)
+                        path = "/".join(part for part in (folder_paths[parent_id], item['name']) if part)
+                        self.paths[path] = item['id']
+                        self.parents.setdefault(item['id'], self.root_id if parent_id == root_id else parent_id)
+                        if item['mimeType'] == FOLDER_MIME_TYPE and item['id'] not in folder_paths:
+                            folder_paths[item['id']] = path
+                            pending.append(item['id'])
+                        yield path, item
+
+    def _list(self, folder_ids, page_token):
+        query = " or ".join("'{}' in parents".format(escape_query_value(folder_id)) for folder_id in folder_ids)
+        if self.query:
+            query = "({}) and {}".format(query, self.query)
+
+        request = self.service.files().list(q=query,
+                                            fields="nextPageToken, files({})".format(self.fields),
+                                            pageSize=self.page_size,
+                                            pageToken=page_token)
+        return execute(request, http=thread_http(self.service))
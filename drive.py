@@ -2,24 +2,66 @@
 # coding: utf8
 
 from __future__ import print_function
+from concurrent.futures import ThreadPoolExecutor
+
 from apiclient import errors
 
+from execution import MAX_BATCH_SIZE, execute, execute_batch, thread_http
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+# Default fields mask used for each file by the iter_* generators
+DEFAULT_FILE_FIELDS = "kind, id, name, mimeType"
+
+
+def _about_request(service, fields="*"):
+    return service.about().get(fields=fields)
 
-def print_about(service, fields="*"):
+
+def print_about(service, fields="*", cache=None):
     """
     Print all information about the active user (storage limit, quota...)
     It is possible to specify a specific field with field argument.
     for exemple : 
         print_about(service, fields="user")
+    cache : optional cache.ResponseCache, revalidated with the ETag of the response
     """
 
     try:    
-        response = service.about().get(fields=fields).execute()
+        if cache is not None:
+            return cache.execute(_about_request(service, fields))
+        response = execute(_about_request(service, fields))
         return response
     except errors.HttpError as error:
         raise error
 
 
+def escape_query_value(value):
+    """
+    Escape 'value' so it can be put between single quotes in a gdrive query,
+    for example "name contains '{}'".format(escape_query_value("l'été"))
+    """
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def _location_query(location):
+    """
+    Traduit le paramètre 'location' de get_files en query gdrive.
+    """
+    if location == "shared":
+        return "sharedWithMe"
+    elif location == "root":
+        return "'root' in parents"
+    # "all" ou valeur inconnue
+    return "name contains ''"
+
+
+def _get_files_request(service, location="root", nb=100):
+    return service.files().list(q=_location_query(location),
+                                orderBy='folder, createdTime',
+                                pageSize=nb)
+
+
 def get_files(service, location="root", nb=100):
     """
     Affiche les 'n' premiers fichiers auquels l'utilisateur à accès, 
@@ -31,21 +73,11 @@ def get_files(service, location="root", nb=100):
         - "all" affiche tous les fichiers (y compris les shared)
         - "shared" affiche seulement les éléments partagés avec le user
         - "root" affiche les éléments à la racine du user (ceux dont il est propriétaire)
+    Pour parcourir tous les fichiers au-delà de 'nb', voir iter_get_files.
     """
-    
-    if location == "all":
-        location = "name contains ''"
-    elif location == "shared":
-        location = "sharedWithMe"
-    elif location == "root":
-        location = "'root' in parents"
-    else:
-        location = "name contains ''"
 
     try:
-        response = service.files().list(q=location,
-                                        orderBy='folder, createdTime',
-                                        pageSize=nb).execute()
+        response = execute(_get_files_request(service, location, nb))
 
         items = response.get('files', [])
 
@@ -54,54 +86,159 @@ def get_files(service, location="root", nb=100):
         raise error
 
 
+def _search_file_request(service, name, nb=100):
+    query = "name contains '{}'".format(escape_query_value(name))
+
+    return service.files().list(q=query, orderBy='folder, createdTime', pageSize=nb)
+
+
 def search_file(service, name, nb=100):
     """
     Permet de rechercher un fichier par son nom (parramètre 'name') dans un drive.
     Retourne une liste (max 100) des fichiers qui correspondent à la requête.
     voir l'utilisation des queries gdrive ici : https://developers.google.com/drive/api/v3/search-files
     """
-    query = "name contains '{}'".format(name)
-
     try:
-        response = service.files().list(q=query, orderBy='folder, createdTime',pageSize=nb).execute()
+        response = execute(_search_file_request(service, name, nb))
         items = response.get('files', [])
         return items
     except errors.HttpError as error:
         raise error
 
 
+def _full_search_file_request(service, fulltext, nb=100):
+    query = "fullText contains '{}'".format(escape_query_value(fulltext))
+
+    return service.files().list(q=query, pageSize=nb)
+
+
 def full_search_file(service, fulltext, nb=100):
     """
     Identique à la fonction search_file, sauf que cette fonction recherche le parramètre 'fulltext' dans tous le fichier
     (nom et contenu).
     voir l'utilisation des queries gdrive ici : https://developers.google.com/drive/api/v3/search-files
     """
-    query = "fullText contains '{}'".format(fulltext)
-
     try:
-        response = service.files().list(q=query, pageSize=nb).execute()
+        response = execute(_full_search_file_request(service, fulltext, nb))
         items = response.get('files', [])
         return items
     except errors.HttpError as error:
         raise error
 
 
-def trash_file(service, file_id):
+def iter_files(service, query=None, fields=DEFAULT_FILE_FIELDS, page_size=1000, order_by=None, prefetch=False,
+               http=None):
     """
-    Move file into trash on GDRIVE where 'file_id' is the id of the file
+    Generator yielding, one by one, every file matching 'query', following 'nextPageToken' until the last page.
+    Only one page is held in memory at a time.
+    - query : gdrive query (cf https://developers.google.com/drive/api/v3/search-files). None lists every file.
+    - fields : fields mask applied to each file, for example "id, name, parents"
+    - page_size : number of files requested per page (max 1000)
+    - order_by : optional sort order, for example 'folder, createdTime'
+    - prefetch : if True, the next page is fetched on a background thread while the current one is consumed.
+    - http : http transport used to execute the requests, cf execution.thread_http when called from a worker thread.
     """
-    
+    kwargs = {
+        'pageSize': page_size,
+        'fields': "nextPageToken, files({})".format(fields),
+    }
+    if query:
+        kwargs['q'] = query
+    if order_by:
+        kwargs['orderBy'] = order_by
+
+    files = service.files()
+    request = files.list(**kwargs)
+
+    if not prefetch:
+        while request is not None:
+            try:
+                response = execute(request, http=http)
+            except errors.HttpError as error:
+                raise error
+            for item in response.get('files', []):
+                yield item
+            request = files.list_next(request, response)
+        return
+
+    def fetch(page_request):
+        return execute(page_request, http=thread_http(service))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(fetch, request)
+        while future is not None:
+            try:
+                response = future.result()
+            except errors.HttpError as error:
+                raise error
+            request = files.list_next(request, response)
+            future = executor.submit(fetch, request) if request is not None else None
+            for item in response.get('files', []):
+                yield item
+
+
+def iter_get_files(service, location="root", fields=DEFAULT_FILE_FIELDS, page_size=1000, prefetch=False):
+    """
+    Equivalent of get_files returning a generator over every file of 'location' (no 'nb' limit).
+    cf iter_files for 'fields', 'page_size' and 'prefetch'.
+    """
+    return iter_files(service,
+                      query=_location_query(location),
+                      fields=fields,
+                      page_size=page_size,
+                      order_by='folder, createdTime',
+                      prefetch=prefetch)
+
+
+def iter_search_file(service, name, fields=DEFAULT_FILE_FIELDS, page_size=1000, prefetch=False):
+    """
+    Equivalent of search_file returning a generator over every matching file.
+    cf iter_files for 'fields', 'page_size' and 'prefetch'.
+    """
+    return iter_files(service,
+                      query="name contains '{}'".format(escape_query_value(name)),
+                      fields=fields,
+                      page_size=page_size,
+                      order_by='folder, createdTime',
+                      prefetch=prefetch)
+
+
+def iter_full_search_file(service, fulltext, fields=DEFAULT_FILE_FIELDS, page_size=1000, prefetch=False):
+    """
+    Equivalent of full_search_file returning a generator over every matching file.
+    cf iter_files for 'fields', 'page_size' and 'prefetch'.
+    """
+    return iter_files(service,
+                      query="fullText contains '{}'".format(escape_query_value(fulltext)),
+                      fields=fields,
+                      page_size=page_size,
+                      prefetch=prefetch)
+
+
+def _trash_file_request(service, file_id):
     body = {
         'trashed': True,
     }
 
+    return service.files().update(body=body,
+                                  fileId=file_id)
+
+
+def trash_file(service, file_id):
+    """
+    Move file into trash on GDRIVE where 'file_id' is the id of the file
+    """
+
     try:
-        return service.files().update(body=body, 
-                                      fileId=file_id).execute()
+        return execute(_trash_file_request(service, file_id))
     except errors.HttpError as error:
         raise error
 
 
+def _delete_file_request(service, file_id):
+    return service.files().delete(fileId=file_id)
+
+
 def delete_file(service, file_id):
     """
     Delete file on GDRIVE where 'file_id' is the id of the file.
@@ -109,11 +246,21 @@ def delete_file(service, file_id):
     Préférez la fonction trash_file pour mettre un élément à la poubelle.
     """
     try:
-        return service.files().delete(fileId=file_id).execute()
+        return execute(_delete_file_request(service, file_id))
     except errors.HttpError as error:
         raise error
 
 
+def _create_folder_request(service, parent_id, foldername):
+    file_metadata = {
+        'name': foldername,
+        'mimeType': FOLDER_MIME_TYPE,
+        'parents': [parent_id],
+    }
+
+    return service.files().create(body=file_metadata)
+
+
 def create_folder(service, parent_id, foldername):
     """Create Folder on GDRIVE
     Parameters : 
@@ -121,19 +268,22 @@ def create_folder(service, parent_id, foldername):
     foldername : Name of the folder we want to create
     """
 
-    file_metadata = {
-        'name': foldername,
-        'mimeType': 'application/vnd.google-apps.folder',
-        'parents': [parent_id],
-    }
-
     try:    
-        response = service.files().create(body=file_metadata).execute()
+        response = execute(_create_folder_request(service, parent_id, foldername))
         return response
     except errors.HttpError as error:
         raise error
 
 
+def _copy_file_request(service, origin_file, parents_list):
+    body = {
+        "parents": parents_list,
+        "name": origin_file['name']
+    }
+
+    return service.files().copy(fileId=origin_file['id'], body=body)
+
+
 def copy_file(service, origin_file, parents_list):
     """Copy an existing file.
 
@@ -145,65 +295,104 @@ def copy_file(service, origin_file, parents_list):
     Returns:
     The copied file if successful, None otherwise.
     """
-    body = {
-        "parents": parents_list,
-        "name": origin_file['name']
-    }
-
     try:
-        return service.files().copy(
-            fileId=origin_file['id'], body=body).execute()
+        return execute(_copy_file_request(service, origin_file, parents_list))
     except errors.HttpError as error:
         raise error
     return None
 
 
-def rename_file(service, file_id, new_name):    
+def _rename_file_request(service, file_id, new_name):
     body = {
         'name': new_name,
     }
 
+    return service.files().update(body=body,
+                                  fileId=file_id)
+
+
+def rename_file(service, file_id, new_name):
     try:
-        return service.files().update(body=body,
-                                      fileId=file_id).execute()
+        return execute(_rename_file_request(service, file_id, new_name))
     except errors.HttpError as error:
         raise error
 
 
-def mkdir_gdrive(service, Tree, parent_id):
+def mkdir_gdrive(service, Tree, parent_id, journal=None, batch_size=MAX_BATCH_SIZE):
     """
     Create 'Tree' directory into 'parent_id' folder on GDRIVE.
-    Tree should be a dictionnary that represent folder-tree
+    Tree should be a dictionnary that represent folder-tree, for example :
+        {"project": {"docs": None, "src": {"tests": None}}}
+    The tree is created level by level : all the folders of a same depth are created
+    through batch requests of 'batch_size' folders.
+    journal : optional journal.Journal. Created folders are recorded in it and
+    folders already recorded are not created again if the function is run again.
+    Returns a dictionnary mapping the path of each folder ("project/src/tests") to its ID.
     """
-    
-    i = 0
-    for key, val in Tree.items():
-        file_metadata = {
-            'name': key,
-            'mimeType': 'application/vnd.google-apps.folder',
-            'parents': [parent_id],
-        }
-
-        try:
-            results = service.files().create(body=file_metadata,
-                                             fields='id').execute()
-        except errors.HttpError as error:
-            raise error
-
-        new_parent_folder_id = str(results.get('id'))
 
-        if i == 0:
-            project_folder_id = new_parent_folder_id
-        i = i + 1
-        if isinstance(val, dict):
-            mkdir_gdrive(service=service,
-                         Tree=val,
-                         parent_id=new_parent_folder_id)
+    paths = {}
+    # (chemin, nom, sous-arborescence, ID du dossier parent) pour le niveau en cours
+    level = [(key, key, val, parent_id) for key, val in Tree.items()]
+
+    while level:
+        created = {}
+        to_create = []
+        requests = []
+        for path, name, _, folder_parent_id in level:
+            journal_key = "{}/{}".format(folder_parent_id, name)
+            results = journal.get(journal_key) if journal is not None else None
+            if results is not None:
+                created[path] = results
+                continue
+
+            file_metadata = {
+                'name': name,
+                'mimeType': FOLDER_MIME_TYPE,
+                'parents': [folder_parent_id],
+            }
+            to_create.append((path, journal_key))
+            requests.append(service.files().create(body=file_metadata, fields='id'))
+
+        first_error = None
+        for (path, journal_key), (results, error) in zip(to_create,
+                                                         execute_batch(service, requests, batch_size=batch_size)):
+            if error is not None:
+                first_error = first_error or error
+                continue
+            if journal is not None:
+                journal.record(journal_key, results)
+            created[path] = results
+        if first_error is not None:
+            raise first_error
+
+        next_level = []
+        for path, _, val, _ in level:
+            folder_id = str(created[path].get('id'))
+            paths[path] = folder_id
+            if isinstance(val, dict):
+                next_level.extend(("{}/{}".format(path, key), key, sub_tree, folder_id)
+                                  for key, sub_tree in val.items())
+        level = next_level
+
+    return paths
+
+
+def _share_file_request(service, file_id, email, sendNotificationEmail, role, type_, domain=None):
+    body = {
+        "role": role,
+        "type": type_,
+    }
+    if email:
+        body["emailAddress"] = email
+    if domain:
+        body["domain"] = domain
 
-    return project_folder_id
+    return service.permissions().create(body=body,
+                                        fileId=file_id,
+                                        sendNotificationEmail=sendNotificationEmail)
 
 
-def share_file(service, file_id, email, sendNotificationEmail, role, type_):
+def share_file(service, file_id, email, sendNotificationEmail, role, type_, domain=None):
     """Share Folder on GDRIVE
     Parameters : 
     - file_id : ID of the file when we want to share
@@ -211,38 +400,67 @@ def share_file(service, file_id, email, sendNotificationEmail, role, type_):
     - sendNotificationEmail : True or False either if we want to send notification email
     - role : what permission will have the new user on the file (owner, organizer, 
     fileOrganizer, writer, reader)
+    - type_ : user, group, domain or anyone
+    - domain : domain to share the file with when type_ is "domain" (email is None)
     """
 
-    body = {
-        "role": role,
-        "type": type_,
-        "emailAddress": email
-    }
-
     try:
-        response = service.permissions().create(body=body,
-                                                fileId=file_id,
-                                                sendNotificationEmail=sendNotificationEmail).execute()
+        response = execute(_share_file_request(service, file_id, email, sendNotificationEmail, role, type_, domain))
         return response
     except errors.HttpError as error:
         raise error
 
 
-def get_shared_users(service, fileId):
+def _shared_users_request(service, fileId, fields="id,emailAddress,role"):
+    return service.permissions().list(fileId=fileId,
+                                      fields="nextPageToken, "
+                                             "permissions({})".format(fields))
+
+
+def get_shared_users(service, fileId, fields="id,emailAddress,role"):
     """
-    Get the list of shared users on a specific file
+    Get the list of shared users on a specific file (every page of permissions.list)
+    - fields : fields of each permission, for example "id,type,role,emailAddress,domain"
+    """
+
+    permissions_resource = service.permissions()
+    request = _shared_users_request(service, fileId, fields)
+    permissions = []
+    while request is not None:
+        try:
+            shared_users = execute(request)
+        except errors.HttpError as error:
+            raise error
+        permissions.extend(shared_users.get('permissions', []))
+        request = permissions_resource.list_next(request, shared_users)
+    return permissions
+
+
+def _update_permission_request(service, fileId, permissionId, role):
+    return service.permissions().update(fileId=fileId,
+                                        permissionId=permissionId,
+                                        body={"role": role})
+
+
+def update_permission(service, fileId, permissionId, role):
+    """
+    Change the role of an existing permission on a file.
+    fileId : The ID of the file
+    permissionId : the permissionId of the user on this file
+    role : new role (writer, commenter, reader...)
     """
 
     try:
-        shared_users = service.permissions().list(fileId=fileId, 
-                                                  fields="nextPageToken, " \
-                                                         "permissions(id,emailAddress,role)").execute()
-        permissions = shared_users.get('permissions', [])
-        return permissions
+        response = execute(_update_permission_request(service, fileId, permissionId, role))
+        return response
     except errors.HttpError as error:
         raise error
 
 
+def _delete_permission_request(service, fileId, permissionId):
+    return service.permissions().delete(fileId=fileId, permissionId=permissionId)
+
+
 def delete_permission(service, fileId, permissionId):
     """
     Remove permission on file. 
@@ -251,61 +469,91 @@ def delete_permission(service, fileId, permissionId):
     """
     
     try:
-        service.permissions().delete(fileId=fileId, permissionId=permissionId).execute()
+        execute(_delete_permission_request(service, fileId, permissionId))
     except errors.HttpError as error:
         raise error
 
 
-def duplicate_tree(service, list_of_folder_objects, parent_id, lst):
+def duplicate_tree(service, list_of_folder_objects, parent_id, lst, max_workers=10, journal=None):
     """
     Fonction qui duplique une/des arborescences et retourne une 
     liste de tous les objets créé (avec mimeType, id, name...).
+    Chaque objet créé contient aussi la clé "source_id" : l'ID de l'élément copié.
     Explication des paramètres : 
     - list_of_folder_objects : Il s'agit d'une liste contenant un dictionnaire par dossier à copier. 
     Chaque dictionnaire contient l'ID, le nom et le mimeType du dossier ou fichier à dupliquer.
+    - max_workers : nombre maximum de requêtes envoyées en parallèle.
+    - journal : journal.Journal optionnel. Chaque élément créé y est enregistré et, si la fonction est relancée
+    (après une erreur de quota, un redémarrage...), les éléments déjà enregistrés ne sont pas recréés.
     
     Voici la fonction permettant de récupérer ces informations pour 1 dossier :
 
     folder_to_copy = [service.files().get(fileId = my_folder_id, 
                                           fields = "id, name, mimeType").execute()] 
 
+    L'arborescence est parcourue niveau par niveau : les dossiers d'un niveau sont créés et listés,
+    puis tous leurs fichiers sont copiés en parallèle, avant de passer au niveau suivant.
     """
 
-    for item in list_of_folder_objects:
-        if item['mimeType'] == "application/vnd.google-apps.folder":
-
+    def create_and_list(folder, destination_id):
+        http = thread_http(service)
+        new_folder = journal.get(folder['id']) if journal is not None else None
+        if new_folder is None:
             try:
-                new_folder = create_folder(service=service,
-                                           parent_id=parent_id,
-                                           foldername=item['name'])
+                new_folder = execute(_create_folder_request(service, destination_id, folder['name']), http=http)
             except errors.HttpError as error:
                 raise error
+            if journal is not None:
+                journal.record(folder['id'], new_folder)
+        children = list(iter_files(service,
+                                   query="'{}' in parents".format(folder['id']),
+                                   fields="id, name, mimeType",
+                                   http=http))
+        return new_folder, children
+
+    def copy(element, destination_id):
+        new_file = journal.get(element['id']) if journal is not None else None
+        if new_file is None:
+            try:
+                new_file = execute(_copy_file_request(service, element, [destination_id]),
+                                   http=thread_http(service))
+            except errors.HttpError as error:
+                raise error
+            if journal is not None:
+                journal.record(element['id'], new_file)
+        return new_file
+
+    # (dossier source, ID du dossier de destination) pour le niveau en cours
+    level = [(item, parent_id) for item in list_of_folder_objects if item['mimeType'] == FOLDER_MIME_TYPE]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while level:
+            created = list(executor.map(lambda args: create_and_list(*args), level))
+
+            files_to_copy = []
+            next_level = []
+            for (folder, _), (new_folder, children) in zip(level, created):
+                new_folder["source_id"] = folder["id"]
+                lst.append(new_folder)
+                for element in children:
+                    if element['mimeType'] == FOLDER_MIME_TYPE:
+                        next_level.append((element, new_folder['id']))
+                    else:
+                        files_to_copy.append((element, new_folder['id']))
+
+            for (element, _), new_file in zip(files_to_copy,
+                                              executor.map(lambda args: copy(*args), files_to_copy)):
+                new_file["source_id"] = element["id"]
+                lst.append(new_file)
+
+            level = next_level
 
-            new_folder["source_id"] = item["id"]
-            lst.append(new_folder)
-
-            query = "parents in '" + item["id"] + "'"
-
-            response = service.files().list(q=query,
-                                            fields="nextPageToken,"
-                                                   " files(id, name, mimeType)").execute()
-
-            children_items = response['files']
+    return lst
 
-            if children_items:
-                for element in children_items:
-                    if element['mimeType'] != "application/vnd.google-apps.folder":
-                        new_file = copy_file(service=service,
-                                             origin_file=element,
-                                             parents_list=[new_folder['id']])
-                        new_file["source_id"] = element["id"]
-                        lst.append(new_file)
 
-            duplicate_tree(service=service,
-                           list_of_folder_objects=children_items,
-                           parent_id=new_folder['id'],
-                           lst=lst)
-    return lst
+def _add_parent_request(service, file_id, parent_id):
+    return service.files().update(fileId=file_id,
+                                  addParents=parent_id)
 
 
 def add_parent(service, file_id, parent_id):
@@ -319,28 +567,56 @@ def add_parent(service, file_id, parent_id):
     """
 
     try:
-        response = service.files().update(fileId=file_id,
-                                          addParents=parent_id).execute()
+        response = execute(_add_parent_request(service, file_id, parent_id))
         return response
     except errors.HttpError as error:
         raise error
 
 
-def get_file_infos(service, file_id):
+def _file_infos_request(service, file_id):
+    return service.files().get(fileId=file_id,
+                               fields="*")
+
+
+def _file_version_request(service, file_id):
+    return service.files().get(fileId=file_id, fields="version")
+
+
+def get_file_infos(service, file_id, cache=None):
     """
     Permet de récupérer toutes les informations sur un fichier via son ID Gdrive
     :param service: service: service google ayant les droits sur les scopes necessaires.
     :param file_id: id du fichier
+    :param cache: cache.ResponseCache optionnel. Une réponse en cache est revalidée par son ETag,
+    ou à défaut par le champ "version" du fichier (requête beaucoup plus légère que fields="*").
     :return: http response
     """
+    def is_current(cached):
+        return 'version' in cached and execute(_file_version_request(service, file_id)).get('version') == \
+            cached['version']
+
     try:
-        response = service.files().get(fileId=file_id,
-                                       fields="*").execute()
+        if cache is not None:
+            return cache.execute(_file_infos_request(service, file_id), revalidate=is_current)
+        response = execute(_file_infos_request(service, file_id))
         return response
     except errors.HttpError as error:
         raise error
 
 
+def _change_owner_request(service, file_id, email):
+    body = {
+        "role": "owner",
+        "type": "user",
+        "emailAddress": email
+    }
+
+    return service.permissions().create(body=body,
+                                        fileId=file_id,
+                                        sendNotificationEmail=True,
+                                        transferOwnership=True)
+
+
 def change_owner(service, file_id, email):
     """
     Permet de changer le propriétaire sur un dossier fichier GDrive
@@ -350,17 +626,40 @@ def change_owner(service, file_id, email):
     :return: Dictionnaire
     """
 
-    body = {
-        "role": "owner",
-        "type": "user",
-        "emailAddress": email
-    }
-
     try:
-        response = service.permissions().create(body=body,
-                                                fileId=file_id,
-                                                sendNotificationEmail=True,
-                                                transferOwnership=True).execute()
+        response = execute(_change_owner_request(service, file_id, email))
         return response
     except errors.HttpError as error:
         raise error
+
+
+# Operations accepted by bulk_execute, with the function building their request
+BULK_OPERATIONS = {
+    'share_file': _share_file_request,
+    'update_permission': _update_permission_request,
+    'delete_permission': _delete_permission_request,
+    'trash_file': _trash_file_request,
+    'delete_file': _delete_file_request,
+    'rename_file': _rename_file_request,
+    'add_parent': _add_parent_request,
+}
+
+
+def bulk_execute(service, operations, batch_size=MAX_BATCH_SIZE):
+    """
+    Execute many operations through Drive batch requests instead of one HTTP round trip per operation.
+    - operations : iterable of (operation_name, kwargs) tuples, operation_name being a key of BULK_OPERATIONS
+    and kwargs the arguments of the matching function (without 'service'). For example :
+        bulk_execute(service, [("trash_file", {"file_id": id_1}),
+                               ("rename_file", {"file_id": id_2, "new_name": "foo"})])
+    - batch_size : number of operations per batch request (max 100)
+    Returns a list of (response, error) tuples in the same order as 'operations',
+    'error' being the errors.HttpError of the operation or None.
+    """
+    requests = []
+    for operation, kwargs in operations:
+        if operation not in BULK_OPERATIONS:
+            raise ValueError("'{}' not in {}".format(operation, tuple(BULK_OPERATIONS)))
+        requests.append(BULK_OPERATIONS[operation](service, **kwargs))
+
+    return execute_batch(service, requests, batch_size=batch_size)
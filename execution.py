@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import google_auth_httplib2
+import httplib2
+from apiclient import errors
+from googleapiclient.http import build_http
+
+import metrics
+
+# Maximum number of calls the Google APIs accept in one batch request
+MAX_BATCH_SIZE = 100
+
+# Number of retries of a call throttled by the API (403 rate limit, 429) or failing with a 5xx error
+MAX_RETRIES = 8
+
+# Backoff (seconds) before the first retry, doubled on each retry up to MAX_BACKOFF
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 64
+
+# 403 reasons meaning that the call was throttled and can be retried
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+_local = threading.local()
+
+
+class RateLimiter(object):
+    """
+    Token bucket shared by every thread executing calls through execute() / execute_batch().
+    The rate (calls per second) adapts itself : it slowly increases after each successful call
+    (up to 'max_rate') and is cut by 'decrease' when the API throttles a call (down to 'min_rate').
+    This way, workers run close to the quota ceiling without being throttled again and again.
+    'calls' and 'throttles' count the calls made through the limiter and the ones throttled by the API.
+    """
+
+    def __init__(self, rate=10.0, burst=None, min_rate=0.5, max_rate=100.0, increase=0.1, decrease=0.5):
+        self.rate = float(rate)
+        self.burst = burst or max(1.0, self.rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._tokens = self.burst
+        self._last = time.time()
+        self._last_throttle = 0.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.throttles = 0
+
+    def reserve(self, tokens=1):
+        """
+        Take 'tokens' tokens from the bucket and return the number of seconds
+        the caller has to wait before using them.
+        """
+        with self._lock:
+            self.calls += tokens
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """
+        Block until 'tokens' calls are allowed.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    def succeeded(self, calls=1):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase * calls)
+
+    def throttled(self):
+        with self._lock:
+            self.throttles += 1
+            now = time.time()
+            # Concurrent calls throttled at the same time only cut the rate once
+            if now - self._last_throttle < 1.0:
+                return
+            self._last_throttle = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+
+
+default_limiter = RateLimiter()
+
+
+def current_limiter(limiter=None):
+    """
+    Return 'limiter' if given, else the limiter set for the current thread by use_limiter, else default_limiter.
+    """
+    return limiter or getattr(_local, 'limiter', None) or default_limiter
+
+
+@contextmanager
+def use_limiter(limiter):
+    """
+    Make the calls executed by the current thread without an explicit limiter go through 'limiter'
+    instead of default_limiter, for example to apply a per-user quota:
+        with use_limiter(RateLimiter(rate=5)):
+            get_files(service)
+    """
+    previous = getattr(_local, 'limiter', None)
+    _local.limiter = limiter
+    try:
+        yield limiter
+    finally:
+        _local.limiter = previous
+
+
+def is_retryable(error):
+    """
+    True if 'error' (errors.HttpError) is a throttling or a server error worth retrying.
+    """
+    status = error.resp.status
+    if status == 429 or status >= 500:
+        return True
+    if status == 403:
+        return is_rate_limited(error)
+    return False
+
+
+def is_rate_limited(error):
+    """
+    True if 'error' (errors.HttpError) means the call was throttled by the API.
+    """
+    status = error.resp.status
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    try:
+        content = json.loads(error.content.decode('utf-8') if isinstance(error.content, bytes) else error.content)
+        reasons = [item.get('reason') for item in content['error'].get('errors', [])]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return False
+    return any(reason in RATE_LIMIT_REASONS for reason in reasons)
+
+
+def backoff_delay(retry):
+    """
+    Exponential backoff with full jitter before the retry number 'retry' (starting at 0).
+    """
+    return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** retry))
+
+
+def _capture_response(request):
+    """
+    Wrap request.postproc to keep the status and the size of the response, for the metrics hooks.
+    Returns (dict filled by the wrapper, original postproc to restore).
+    """
+    response_info = {'status': None, 'bytes': 0}
+    postproc = request.postproc
+
+    def capture(resp, content):
+        response_info['status'] = resp.status
+        response_info['bytes'] = len(content or b'')
+        return postproc(resp, content)
+
+    request.postproc = capture
+    return response_info, postproc
+
+
+def _capture_error(response_info, error):
+    response_info['status'] = error.resp.status
+    response_info['bytes'] = len(error.content or b'')
+
+
+def execute(request, http=None, limiter=None, max_retries=MAX_RETRIES):
+    """
+    Execute 'request' (HttpRequest), waiting for the rate limiter first.
+    Throttled calls (403 rate limit, 429) and 5xx errors are retried with an exponential backoff,
+    up to 'max_retries' times, and throttling slows down the limiter.
+    - http : http transport to use, cf thread_http when called from a worker thread
+    - limiter : RateLimiter to use, cf current_limiter by default
+    """
+    limiter = current_limiter(limiter)
+    instrumented = metrics.has_hooks()
+    if instrumented:
+        response_info, postproc = _capture_response(request)
+        start = time.time()
+
+    retry = 0
+    try:
+        while True:
+            limiter.acquire()
+            try:
+                response = request.execute(http=http)
+            except errors.HttpError as error:
+                if instrumented:
+                    _capture_error(response_info, error)
+                if is_rate_limited(error):
+                    limiter.throttled()
+                if retry >= max_retries or not is_retryable(error):
+                    raise error
+                time.sleep(backoff_delay(retry))
+                retry += 1
+                continue
+            limiter.succeeded()
+            return response
+    finally:
+        if instrumented:
+            request.postproc = postproc
+            metrics.record(getattr(request, 'methodId', None), start, time.time() - start,
+                           response_info['bytes'], retry, response_info['status'])
+
+
+def _new_http(http):
+    """
+    Return a new httplib2.Http configured like 'http' (proxy, certificates, timeout), built by
+    googleapiclient.http.build_http : a 60 s timeout by default, and 308 answers (chunks of resumable uploads)
+    are not followed as redirects.
+    """
+    new = build_http()
+    new.proxy_info = http.proxy_info
+    new.ca_certs = http.ca_certs
+    new.disable_ssl_certificate_validation = http.disable_ssl_certificate_validation
+    new.credentials = http.credentials
+    new.certificates = http.certificates
+    if http.timeout is not None:
+        new.timeout = http.timeout
+    return new
+
+
+def thread_http(service):
+    """
+    Return an http transport for 'service' owned by the current thread.
+    httplib2 transports are not thread-safe : a request executed from a worker thread must use its own one,
+    for example request.execute(http=thread_http(service)).
+    The transport is created once per thread and per credentials (or per httplib2.Http for a service built
+    with build(..., http=httplib2.Http())), then reused. Other transports (HttpMock...) cannot be
+    duplicated : a TypeError is raised.
+    """
+    http = service._http
+    authorized = isinstance(http, google_auth_httplib2.AuthorizedHttp)
+    owner = http.credentials if authorized else http
+    if not isinstance(http.http if authorized else http, httplib2.Http):
+        raise TypeError("The transport of the service cannot be used from several threads, "
+                        "build it with credentials or an httplib2.Http")
+
+    transports = _local.__dict__.setdefault('transports', {})
+    cached = transports.get(id(owner))
+    if cached is None or cached[0] is not owner:
+        if authorized:
+            transport = google_auth_httplib2.AuthorizedHttp(http.credentials, http=_new_http(http.http),
+                                                            refresh_status_codes=http._refresh_status_codes,
+                                                            max_refresh_attempts=http._max_refresh_attempts)
+        else:
+            transport = _new_http(http)
+        cached = (owner, transport)
+        transports[id(owner)] = cached
+    return cached[1]
+
+
+def execute_batch(service, requests, batch_size=MAX_BATCH_SIZE, http=None, limiter=None, max_retries=MAX_RETRIES):
+    """
+    Execute a list of unexecuted requests (HttpRequest objects) through batch requests of 'batch_size' calls.
+    Returns a list of (response, error) tuples in the same order as 'requests'.
+    'error' is the errors.HttpError raised by the call, or None if it succeeded.
+    Each call counts for one token of the rate limiter, and calls throttled or failing with a 5xx error
+    are retried in a later batch (cf execute).
+    An error on the batch request itself (not on one of its calls) is raised.
+    """
+    if batch_size > MAX_BATCH_SIZE:
+        raise ValueError("batch_size must be <= {}".format(MAX_BATCH_SIZE))
+
+    limiter = current_limiter(limiter)
+    requests = list(requests)
+    results = [None] * len(requests)
+
+    instrumented = metrics.has_hooks()
+    if instrumented:
+        captured = [_capture_response(request) for request in requests]
+        ends = [None] * len(requests)
+        start_time = time.time()
+
+    def callback(request_id, response, exception):
+        index = int(request_id)
+        results[index] = (response, exception)
+        if instrumented:
+            ends[index] = time.time()
+            if exception is not None:
+                _capture_error(captured[index][0], exception)
+
+    pending = list(range(len(requests)))
+    retries = [0] * len(requests)
+    try:
+        _run_batches(service, requests, results, callback, pending, retries, batch_size, http, limiter, max_retries)
+    finally:
+        if instrumented:
+            end_time = time.time()
+            for index, request in enumerate(requests):
+                response_info, postproc = captured[index]
+                request.postproc = postproc
+                metrics.record(getattr(request, 'methodId', None), start_time, (ends[index] or end_time) - start_time,
+                               response_info['bytes'], retries[index], response_info['status'])
+
+    return results
+
+
+def _run_batches(service, requests, results, callback, pending, retries, batch_size, http, limiter, max_retries):
+    # Execute the 'pending' requests, then retry the throttled ones, until none is left (cf execute_batch)
+    retry = 0
+    while pending:
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            batch = service.new_batch_http_request(callback=callback)
+            for index in chunk:
+                batch.add(requests[index], request_id=str(index))
+
+            limiter.acquire(len(chunk))
+            try:
+                batch.execute(http=http)
+            except errors.HttpError as error:
+                if is_rate_limited(error):
+                    limiter.throttled()
+                if retry >= max_retries or not is_retryable(error):
+                    raise error
+                for index in chunk:
+                    callback(str(index), None, error)
+
+        failed = [index for index in pending
+                  if results[index][1] is not None and is_retryable(results[index][1])]
+        if any(is_rate_limited(results[index][1]) for index in failed):
+            limiter.throttled()
+        limiter.succeeded(len(pending) - len(failed))
+
+        if not failed or retry >= max_retries:
+            break
+        time.sleep(backoff_delay(retry))
+        retry += 1
+        for index in failed:
+            retries[index] += 1
+        pending = failed
@@ -0,0 +1,616 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from urllib.parse import parse_qs, unquote, urlparse
+
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+OWNER_EMAIL = "owner@example.com"
+
+# ID of the root folder (My Drive) of the fake drive, which the alias 'root' designates
+ROOT_ID = "0AAroot000000"
+
+
+def _now():
+    return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _grantee(permission):
+    return permission.get('type'), (permission.get('emailAddress') or permission.get('domain') or '').lower()
+
+
+def _unescape(value):
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _parse_a1(range_):
+    """
+    "'My sheet'!B2:D" -> ("My sheet", 1, 1, None, 3) : sheet, first row, first column, last row, last column
+    (0-based, last ones included, None when open).
+    """
+    sheet, _, cells = range_.rpartition('!')
+    if not sheet:
+        sheet, cells = cells, ""
+    if sheet.startswith("'"):
+        sheet = sheet[1:-1].replace("''", "'")
+    match = re.match(r'^([A-Za-z]*)(\d*)(?::([A-Za-z]*)(\d*))?$', cells)
+    start_column, start_row, end_column, end_row = match.groups()
+    if end_column is None and end_row is None:
+        end_column, end_row = (start_column, start_row) if cells else ("", "")
+    return (sheet,
+            int(start_row) - 1 if start_row else 0,
+            _column_index(start_column) if start_column else 0,
+            int(end_row) - 1 if end_row else None,
+            _column_index(end_column) if end_column else None)
+
+
+class FakeGoogle(object):
+    """
+    In-process HTTP stand-in for the Drive v3 and Sheets v4 endpoints used by this library
+    (files list/get/create/copy/update/delete, media upload/download, permissions, changes,
+    values get/update/append/batchGet/batchUpdate, spreadsheets get/batchUpdate, batch requests).
+    Everything is kept in memory. Fields masks are ignored : full resources are returned.
+    Like in My Drive, the permissions of a folder are propagated to its content.
+    - latency : seconds added to each HTTP request (a (min, max) tuple for a random latency)
+    - error_rate : probability for a call to be answered by a rate limit error (403 userRateLimitExceeded or 429)
+    - max_page_size : maximum number of files returned by a files.list page, to force pagination
+        with FakeGoogle(latency=0.02) as fake:
+            service = fake.service("drive")
+            folder_id = fake.add_file("project", mime_type=FOLDER_MIME_TYPE)
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, max_page_size=1000, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_page_size = max_page_size
+        self.requests = 0
+        self.files = {}
+        # Like on Drive, the root folder is not listed by files.list nor by the Changes API
+        self.root = {'kind': 'drive#file', 'id': ROOT_ID, 'name': "My Drive", 'mimeType': FOLDER_MIME_TYPE,
+                     'parents': [], 'trashed': False, 'createdTime': _now(), 'modifiedTime': _now(),
+                     'version': '1', 'owners': [{'emailAddress': OWNER_EMAIL}]}
+        self.contents = {}
+        self.permissions = {}
+        self.changes = []
+        self.spreadsheets = {}
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+        self._sessions = {}
+        self._server = None
+        self._thread = None
+
+    # Server
+
+    def start(self):
+        handler = type('Handler', (_Handler,), {'fake': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="FakeGoogle")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:{}".format(self._server.server_address[1])
+
+    def service(self, api):
+        """
+        Build a 'drive' or 'sheets' service talking to this server. Like a service built with credentials,
+        its transport is a google_auth_httplib2.AuthorizedHttp (anonymous credentials) on
+        googleapiclient.http.build_http, so execution.thread_http duplicates it as it does in production.
+        """
+        version = {'drive': 'v3', 'sheets': 'v4'}[api]
+        # Every URL (API, batch, media upload) is built from the rootUrl of the discovery document
+        document = json.loads(get_static_doc(api, version))
+        document['rootUrl'] = self.base_url + "/"
+        return build_from_document(document, credentials=AnonymousCredentials())
+
+    # Data
+
+    def new_id(self, prefix="f"):
+        return "{}{:012x}".format(prefix, next(self._ids))
+
+    @staticmethod
+    def _file_id(file_id):
+        return ROOT_ID if file_id == 'root' else file_id
+
+    def _get_item(self, file_id):
+        file_id = self._file_id(file_id)
+        return self.root if file_id == ROOT_ID else self.files[file_id]
+
+    def add_file(self, name, parent_id="root", mime_type="text/plain", content=None, **metadata):
+        """
+        Create a file (or a folder with mime_type=FOLDER_MIME_TYPE) and return its ID.
+        """
+        with self._lock:
+            item = {
+                'kind': 'drive#file',
+                'id': self.new_id(),
+                'name': name,
+                'mimeType': mime_type,
+                'parents': [self._file_id(parent_id)],
+                'trashed': False,
+                'createdTime': _now(),
+                'modifiedTime': _now(),
+                'version': '1',
+                'owners': [{'emailAddress': OWNER_EMAIL}],
+            }
+            item.update(metadata)
+            self.files[item['id']] = item
+            self.permissions[item['id']] = [{'kind': 'drive#permission', 'id': 'owner', 'type': 'user',
+                                             'role': 'owner', 'emailAddress': OWNER_EMAIL}]
+            if content is not None:
+                self._set_content(item, content)
+            self.changes.append(item['id'])
+            return item['id']
+
+    def add_spreadsheet(self, title="Spreadsheet", sheets=(("Sheet1", 1000, 26),)):
+        """
+        Create a spreadsheet with sheets (title, row count, column count) and return its ID.
+        """
+        with self._lock:
+            spreadsheet_id = self.new_id("s")
+            self.spreadsheets[spreadsheet_id] = {'title': title, 'sheets': []}
+            for sheet_title, rows, columns in sheets:
+                self._add_sheet(spreadsheet_id, sheet_title, rows, columns)
+            return spreadsheet_id
+
+    def _add_sheet(self, spreadsheet_id, title, rows, columns):
+        sheets = self.spreadsheets[spreadsheet_id]['sheets']
+        properties = {'sheetId': len(sheets), 'title': title, 'index': len(sheets),
+                      'gridProperties': {'rowCount': rows, 'columnCount': columns}}
+        sheets.append({'properties': properties, 'cells': {}})
+        return properties
+
+    def _set_content(self, item, content):
+        self.contents[item['id']] = content
+        item['size'] = str(len(content))
+        item['md5Checksum'] = hashlib.md5(content).hexdigest()
+        self._touch(item)
+
+    @staticmethod
+    def _touch(item, modified=True):
+        item['version'] = str(int(item['version']) + 1)
+        if modified:
+            item['modifiedTime'] = _now()
+
+    # Request handling
+
+    def handle(self, method, uri, headers, body, batched=False):
+        """
+        Answer one request : returns (status, headers, body bytes).
+        """
+        if not batched:
+            self.requests += 1
+            latency = self.latency
+            if isinstance(latency, tuple):
+                latency = self._random.uniform(*latency)
+            if latency:
+                time.sleep(latency)
+
+        parsed = urlparse(uri)
+        path = parsed.path
+        query_lists = parse_qs(parsed.query)
+        query = {key: values[-1] for key, values in query_lists.items()}
+
+        if path.startswith('/batch/'):
+            return self._batch(headers, body)
+
+        if self.error_rate and not path.startswith('/upload/session/') and self._random.random() < self.error_rate:
+            if self._random.random() < 0.5:
+                return self._error(429, "Too many requests", "rateLimitExceeded")
+            return self._error(403, "User rate limit exceeded", "userRateLimitExceeded")
+
+        data = None
+        if body and headers.get('content-type', '').startswith('application/json'):
+            data = json.loads(body.decode('utf-8'))
+
+        with self._lock:
+            try:
+                if path.startswith('/drive/v3/') or path.startswith('/upload/'):
+                    response = self._drive(method, path, query, headers, data, body)
+                elif path.startswith('/v4/spreadsheets/'):
+                    response = self._sheets(method, path, query, query_lists, data)
+                else:
+                    return self._error(404, "Unknown endpoint {} {}".format(method, path), "notFound")
+            except KeyError:
+                return self._error(404, "Not found", "notFound")
+
+        status, response_headers, content = response
+        if method == 'GET' and status == 200 and response_headers.get('content-type', '').startswith('application/json'):
+            etag = '"{}"'.format(hashlib.md5(content).hexdigest())
+            if headers.get('if-none-match') == etag:
+                return 304, {'etag': etag}, b''
+            response_headers['etag'] = etag
+        return response
+
+    @staticmethod
+    def _json(status, data, headers=None):
+        response_headers = {'content-type': 'application/json; charset=UTF-8'}
+        response_headers.update(headers or {})
+        return status, response_headers, json.dumps(data).encode('utf-8')
+
+    def _error(self, status, message, reason):
+        return self._json(status, {'error': {'code': status, 'message': message,
+                                             'errors': [{'reason': reason, 'message': message}]}})
+
+    # Drive
+
+    def _drive(self, method, path, query, headers, data, body):
+        if path.startswith('/upload/'):
+            return self._upload(method, path, query, headers, data, body)
+
+        parts = [unquote(part) for part in path[len('/drive/v3/'):].split('/')]
+
+        if parts == ['about']:
+            return self._json(200, {'kind': 'drive#about', 'user': {'emailAddress': OWNER_EMAIL},
+                                    'storageQuota': {'limit': '0', 'usage': str(sum(map(len, self.contents.values())))}})
+
+        if parts == ['changes', 'startPageToken']:
+            return self._json(200, {'startPageToken': str(len(self.changes))})
+        if parts == ['changes']:
+            start = int(query['pageToken'])
+            size = min(int(query.get('pageSize', 100)), self.max_page_size)
+            changes = []
+            for file_id in self.changes[start:start + size]:
+                item = self.files.get(file_id)
+                change = {'kind': 'drive#change', 'fileId': file_id, 'removed': item is None}
+                if item is not None:
+                    change['file'] = item
+                changes.append(change)
+            response = {'changes': changes}
+            if start + size < len(self.changes):
+                response['nextPageToken'] = str(start + size)
+            else:
+                response['newStartPageToken'] = str(len(self.changes))
+            return self._json(200, response)
+
+        if parts == ['files']:
+            if method == 'POST':
+                file_id = self.add_file(data['name'], (data.get('parents') or ['root'])[0],
+                                        data.get('mimeType', 'application/octet-stream'))
+                return self._json(200, self.files[file_id])
+            return self._list_files(query)
+
+        item = self._get_item(parts[1])
+        if len(parts) == 2:
+            if method == 'GET':
+                if query.get('alt') == 'media':
+                    return self._download(item, headers)
+                return self._json(200, item)
+            if method == 'DELETE':
+                del self.files[item['id']]
+                self.changes.append(item['id'])
+                return 204, {}, b''
+            if method == 'PATCH':
+                item.update(data or {})
+                for parent_id in (query.get('addParents') or '').split(','):
+                    if parent_id and self._file_id(parent_id) not in item['parents']:
+                        item['parents'].append(self._file_id(parent_id))
+                for parent_id in (query.get('removeParents') or '').split(','):
+                    if self._file_id(parent_id) in item['parents']:
+                        item['parents'].remove(self._file_id(parent_id))
+                self._touch(item)
+                self.changes.append(item['id'])
+                return self._json(200, item)
+
+        if parts[2] == 'copy':
+            copy_id = self.add_file(data.get('name', item['name']), (data.get('parents') or item['parents'])[0],
+                                    item['mimeType'])
+            if item['id'] in self.contents:
+                self._set_content(self.files[copy_id], self.contents[item['id']])
+            return self._json(200, self.files[copy_id])
+
+        if parts[2] == 'permissions':
+            permissions = self.permissions.setdefault(item['id'], [])
+            if method != 'GET':
+                # Sharing changes the version of a file, not its modifiedTime
+                self._touch(item, modified=False)
+            if len(parts) == 3:
+                if method == 'POST':
+                    permission = dict(data, kind='drive#permission', id=self.new_id("p"))
+                    if query.get('transferOwnership') == 'true':
+                        for other in permissions:
+                            if other['role'] == 'owner':
+                                other['role'] = 'writer'
+                    permissions.append(permission)
+                    self._propagate(item, permission)
+                    return self._json(200, permission)
+                return self._json(200, {'kind': 'drive#permissionList', 'permissions': permissions})
+            permission = next((permission for permission in permissions if permission['id'] == parts[3]), None)
+            if permission is None:
+                return self._error(404, "Permission not found: {}".format(parts[3]), "notFound")
+            if method == 'DELETE':
+                permissions.remove(permission)
+                self._propagate(item, permission, removed=True)
+                return 204, {}, b''
+            if method == 'PATCH':
+                permission.update(data)
+                self._propagate(item, permission)
+                return self._json(200, permission)
+            return self._json(200, permission)
+
+        return self._error(404, "Unknown endpoint", "notFound")
+
+    def _propagate(self, folder, permission, removed=False):
+        """
+        Like in My Drive, give the permission added or updated on 'folder' to everything under it, replacing
+        the permission of the same grantee (or remove it if 'removed'). Owners are not changed.
+        """
+        if folder['mimeType'] != FOLDER_MIME_TYPE or permission['role'] == 'owner':
+            return
+        grantee = _grantee(permission)
+        pending = [folder['id']]
+        while pending:
+            parent_id = pending.pop()
+            for child in self.files.values():
+                if parent_id not in child['parents']:
+                    continue
+                permissions = [other for other in self.permissions.get(child['id'], [])
+                               if other['role'] == 'owner' or _grantee(other) != grantee]
+                if not removed:
+                    permissions.append(dict(permission))
+                self.permissions[child['id']] = permissions
+                if child['mimeType'] == FOLDER_MIME_TYPE:
+                    pending.append(child['id'])
+
+    def _list_files(self, query):
+        q = query.get('q', '')
+        parents = [self._file_id(_unescape(value)) for value in re.findall(r"'((?:[^'\\]|\\.)*)' in parents", q)]
+        names = [_unescape(value) for value in re.findall(r"(?:name|fullText) contains '((?:[^'\\]|\\.)*)'", q)]
+        mime_types = [_unescape(value) for value in re.findall(r"mimeType = '((?:[^'\\]|\\.)*)'", q)]
+
+        items = []
+        for item in self.files.values():
+            if parents and not set(parents) & set(item['parents']):
+                continue
+            if any(name not in item['name'] for name in names):
+                continue
+            if mime_types and item['mimeType'] not in mime_types:
+                continue
+            if 'trashed = false' in q and item['trashed']:
+                continue
+            if 'trashed = true' in q and not item['trashed']:
+                continue
+            if 'sharedWithMe' in q and not item.get('shared'):
+                continue
+            items.append(item)
+
+        start = int(query.get('pageToken') or 0)
+        size = min(int(query.get('pageSize', 100)), self.max_page_size)
+        response = {'kind': 'drive#fileList', 'files': items[start:start + size]}
+        if start + size < len(items):
+            response['nextPageToken'] = str(start + size)
+        return self._json(200, response)
+
+    def _upload(self, method, path, query, headers, data, body):
+        if path.startswith('/upload/session/'):
+            session = self._sessions[path.rsplit('/', 1)[1]]
+            content_range = headers.get('content-range', '')
+            match = re.match(r'bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)', content_range)
+            if body and match and match.group(1) is not None:
+                del session['content'][int(match.group(1)):]
+                session['content'].extend(body)
+            total = match.group(3) if match else '*'
+            if total != '*' and len(session['content']) == int(total):
+                if session['file_id']:
+                    item = self.files[session['file_id']]
+                    item.update(session['metadata'])
+                else:
+                    metadata = session['metadata']
+                    item = self.files[self.add_file(metadata.get('name', 'untitled'),
+                                                    (metadata.get('parents') or ['root'])[0],
+                                                    metadata.get('mimeType', session['mime_type']))]
+                self._set_content(item, bytes(session['content']))
+                item['modifiedTime'] = session['metadata'].get('modifiedTime', item['modifiedTime'])
+                self.changes.append(item['id'])
+                return self._json(200, item)
+            response_headers = {}
+            if session['content']:
+                response_headers['range'] = "bytes=0-{}".format(len(session['content']) - 1)
+            return 308, response_headers, b''
+
+        session_id = self.new_id("u")
+        file_id = path.split('/')[-1] if method == 'PATCH' else None
+        self._sessions[session_id] = {'metadata': data or {}, 'file_id': file_id, 'content': bytearray(),
+                                      'mime_type': headers.get('x-upload-content-type', 'application/octet-stream')}
+        return 200, {'location': "{}/upload/session/{}".format(self.base_url, session_id)}, b''
+
+    def _download(self, item, headers):
+        content = self.contents.get(item['id'], b'')
+        match = re.match(r'bytes=(\d+)-(\d*)', headers.get('range', ''))
+        if not match:
+            return 200, {'content-type': 'application/octet-stream'}, content
+        start = int(match.group(1))
+        end = min(int(match.group(2)) if match.group(2) else len(content) - 1, len(content) - 1)
+        if start >= len(content):
+            return 416, {'content-range': "bytes */{}".format(len(content))}, b''
+        return 206, {'content-range': "bytes {}-{}/{}".format(start, end, len(content))}, content[start:end + 1]
+
+    # Sheets
+
+    def _sheets(self, method, path, query, query_lists, data):
+        match = re.match(r'^/v4/spreadsheets/([^/:]+)(.*)$', path)
+        spreadsheet_id, rest = match.group(1), unquote(match.group(2))
+        spreadsheet = self.spreadsheets[spreadsheet_id]
+
+        if rest == '':
+            sheets = []
+            for sheet in spreadsheet['sheets']:
+                entry = {'properties': sheet['properties']}
+                if query.get('includeGridData') == 'true':
+                    entry['data'] = [{'rowData': [{'values': [{'userEnteredValue': {'stringValue': str(value)}}
+                                                              for value in row]}
+                                                  for row in self._read(spreadsheet, sheet['properties']['title'])]}]
+                sheets.append(entry)
+            return self._json(200, {'spreadsheetId': spreadsheet_id, 'properties': {'title': spreadsheet['title']},
+                                    'sheets': sheets})
+
+        if rest == ':batchUpdate':
+            replies = []
+            for request in data['requests']:
+                if 'addSheet' in request:
+                    properties = request['addSheet']['properties']
+                    grid = properties.get('gridProperties', {})
+                    replies.append({'addSheet': {'properties': self._add_sheet(
+                        spreadsheet_id, properties['title'], grid.get('rowCount', 1000),
+                        grid.get('columnCount', 26))}})
+                else:
+                    replies.append({})
+            return self._json(200, {'spreadsheetId': spreadsheet_id, 'replies': replies})
+
+        if rest == '/values:batchGet':
+            return self._json(200, {'spreadsheetId': spreadsheet_id,
+                                    'valueRanges': [self._value_range(spreadsheet, range_)
+                                                    for range_ in query_lists.get('ranges', [])]})
+
+        if rest == '/values:batchUpdate':
+            updated = 0
+            for value_range in data['data']:
+                updated += self._write(spreadsheet, value_range['range'], value_range.get('values', []))
+            return self._json(200, {'spreadsheetId': spreadsheet_id, 'totalUpdatedRows': updated})
+
+        if rest.endswith(':append'):
+            range_ = rest[len('/values/'):-len(':append')]
+            sheet_title = _parse_a1(range_)[0]
+            start_row = len(self._read(spreadsheet, sheet_title))
+            rows = data.get('values', [])
+            self._write(spreadsheet, "'{}'!A{}".format(sheet_title, start_row + 1), rows)
+            return self._json(200, {'spreadsheetId': spreadsheet_id, 'updates': {'updatedRows': len(rows)}})
+
+        if rest.startswith('/values/'):
+            range_ = rest[len('/values/'):]
+            if method == 'PUT':
+                rows = self._write(spreadsheet, range_, data.get('values', []))
+                return self._json(200, {'spreadsheetId': spreadsheet_id, 'updatedRange': range_,
+                                        'updatedRows': rows})
+            return self._json(200, self._value_range(spreadsheet, range_))
+
+        return self._error(404, "Unknown endpoint", "notFound")
+
+    @staticmethod
+    def _sheet(spreadsheet, title):
+        return next(sheet for sheet in spreadsheet['sheets'] if sheet['properties']['title'] == title)
+
+    def _write(self, spreadsheet, range_, rows):
+        sheet_title, start_row, start_column, _, _ = _parse_a1(range_)
+        cells = self._sheet(spreadsheet, sheet_title)['cells']
+        for row_offset, row in enumerate(rows):
+            for column_offset, value in enumerate(row):
+                cells[(start_row + row_offset, start_column + column_offset)] = value
+        return len(rows)
+
+    def _read(self, spreadsheet, range_):
+        sheet_title, start_row, start_column, end_row, end_column = _parse_a1(range_)
+        sheet = self._sheet(spreadsheet, sheet_title)
+        grid = sheet['properties']['gridProperties']
+        end_row = grid['rowCount'] - 1 if end_row is None else end_row
+        end_column = grid['columnCount'] - 1 if end_column is None else end_column
+
+        rows = {}
+        for (row, column), value in sheet['cells'].items():
+            if start_row <= row <= end_row and start_column <= column <= end_column and value != '':
+                rows.setdefault(row, {})[column] = value
+        if not rows:
+            return []
+        values = []
+        for row in range(start_row, max(rows) + 1):
+            cells = rows.get(row, {})
+            width = max(cells) - start_column + 1 if cells else 0
+            values.append([cells.get(start_column + index, '') for index in range(width)])
+        return values
+
+    def _value_range(self, spreadsheet, range_):
+        value_range = {'range': range_, 'majorDimension': 'ROWS'}
+        values = self._read(spreadsheet, range_)
+        if values:
+            value_range['values'] = values
+        return value_range
+
+    # Batch requests
+
+    def _batch(self, headers, body):
+        boundary = re.search(r'boundary="?([^";]+)"?', headers['content-type']).group(1)
+        parts = body.decode('utf-8').split('--' + boundary)[1:-1]
+        response_parts = []
+        for part in parts:
+            part_headers, _, http_request = part.strip('\r\n').replace('\r\n', '\n').partition('\n\n')
+            content_id = re.search(r'Content-ID: <([^>]*)>', part_headers, re.IGNORECASE).group(1)
+            request_line, _, rest = http_request.partition('\n')
+            request_headers, _, request_body = rest.partition('\n\n')
+            method, uri, _ = request_line.split(' ')
+            sub_headers = {}
+            for line in request_headers.split('\n'):
+                if ':' in line:
+                    key, value = line.split(':', 1)
+                    sub_headers[key.strip().lower()] = value.strip()
+            status, response_headers, content = self.handle(method, uri, sub_headers,
+                                                            request_body.encode('utf-8') or None, batched=True)
+            response_parts.append(
+                "Content-Type: application/http\r\nContent-ID: <response-{}>\r\n\r\n"
+                "HTTP/1.1 {} OK\r\nContent-Type: application/json\r\n\r\n{}\r\n".format(
+                    content_id, status, content.decode('utf-8')))
+
+        boundary = "batch_fake_boundary"
+        content = "".join("--{}\r\n{}".format(boundary, part) for part in response_parts)
+        content += "--{}--\r\n".format(boundary)
+        return 200, {'content-type': 'multipart/mixed; boundary={}'.format(boundary)}, content.encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    fake = None
+
+    def _handle(self):
+        length = int(self.headers.get('content-length') or 0)
+        body = self.rfile.read(length) if length else None
+        headers = {key.lower(): value for key, value in self.headers.items()}
+        status, response_headers, content = self.fake.handle(self.command, self.path, headers, body)
+        self.send_response(status)
+        for key, value in response_headers.items():
+            self.send_header(key, value)
+        self.send_header('content-length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from execution import RateLimiter, use_limiter
+from services import ServicePool
+
+# Outcome of the task of one user :
+# - user_email : impersonated user
+# - result : value returned by the task, None if it failed
+# - error : exception raised by the task (errors.HttpError, google.auth.exceptions.RefreshError for a
+#   suspended user...), None if it succeeded
+# - calls : number of API calls made for the user, batched calls included
+# - throttles : number of calls throttled by the API (per-user rate limit)
+# - elapsed : duration (seconds) of the task
+UserResult = namedtuple('UserResult', ['user_email', 'result', 'error', 'calls', 'throttles', 'elapsed'])
+
+# Service pools of the current process, by credentials file : each worker process keeps its own
+# delegated credentials (and access tokens) from one user to the next.
+_pools = {}
+
+
+def _get_pool(credentials_file):
+    if credentials_file not in _pools:
+        _pools[credentials_file] = ServicePool(credentials_file)
+    return _pools[credentials_file]
+
+
+def _run_user(task, user_email, scopes, api, credentials_file, rate):
+    # Run in the worker thread or process : every call made by the task goes through the user's own limiter
+    limiter = RateLimiter(rate=rate, max_rate=max(rate, 100.0))
+    start = time.time()
+    with use_limiter(limiter):
+        try:
+            service = _get_pool(credentials_file).get(scopes, api, user_email=user_email)
+            result, error = task(service, user_email), None
+        except Exception as error_:
+            result, error = None, error_
+    return UserResult(user_email, result, error, limiter.calls, limiter.throttles, time.time() - start)
+
+
+def fan_out(users, task, scopes, api="drive", max_workers=16, processes=False, rate=10.0, credentials_file=None):
+    """
+    Generator running 'task' for each user of 'users' (emails of the domain) through domain-wide delegation,
+    on a pool of 'max_workers' threads (or processes if 'processes' is True), and yielding a UserResult
+    for each user as soon as its task ends (not in the order of 'users').
+    - task : function called with (service impersonating the user, user email). It must be defined at the
+    top level of a module when 'processes' is True, for example:
+        def audit(service, user_email):
+            return [(item['id'], drive.get_shared_users(service, item['id']))
+                    for item in drive.iter_files(service, "'me' in owners", fields="id")]
+
+        for user in fan_out(users, audit, ["https://www.googleapis.com/auth/drive"]):
+            if user.error is not None:
+                ...
+    - rate : calls per second allowed at first for each user. Each user has its own execution.RateLimiter,
+    used instead of default_limiter by the calls made from the task's thread, so that a throttled user
+    does not slow the others down.
+    - credentials_file : service account credentials, services.SERVICE_ACCOUNT_CREDENTIALS_FILE by default
+    A task failing for one user (suspended account, missing scope...) does not stop the others : its
+    exception is returned in UserResult.error.
+    Calls made by threads started by the task itself (duplicate_tree, TreeCrawler...) use their thread's limiter.
+    """
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    scopes = tuple(scopes)
+    users = iter(users)
+    in_flight = set()
+
+    with executor_class(max_workers=max_workers) as executor:
+        while True:
+            # Users are submitted as workers become free, so a huge user list is never held in memory
+            for user_email in users:
+                in_flight.add(executor.submit(_run_user, task, user_email, scopes, api, credentials_file, rate))
+                if len(in_flight) >= 2 * max_workers:
+                    break
+            if not in_flight:
+                return
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
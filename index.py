@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+import json
+import sqlite3
+import threading
+
+from apiclient import errors
+
+from drive import iter_files
+from execution import execute
+
+# Fields stored in the index for each file
+INDEX_FIELDS = "id, name, parents, mimeType, md5Checksum, modifiedTime, owners(emailAddress), trashed"
+
+
+class DriveIndex(object):
+    """
+    Local copy (SQLite) of the metadata of every file of a drive :
+    id, name, parents, mimeType, md5Checksum, modifiedTime and owners.
+    The index is built once with build(), then kept up to date with update(), which only
+    downloads the changes since the last call (Changes API). Lookups (get, find_by_name,
+    children, find_by_path) are then answered locally, without any call to the API.
+        index = DriveIndex("/var/cache/drive.index")
+        if not index.page_token:
+            index.build(service)
+        index.update(service)
+        index.find_by_path("project/docs")
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                mimeType TEXT,
+                md5Checksum TEXT,
+                modifiedTime TEXT,
+                owners TEXT
+            );
+            CREATE INDEX IF NOT EXISTS files_name ON files (name);
+            CREATE TABLE IF NOT EXISTS parents (
+                file_id TEXT NOT NULL,
+                parent_id TEXT NOT NULL,
+                PRIMARY KEY (file_id, parent_id)
+            );
+            CREATE INDEX IF NOT EXISTS parents_parent_id ON parents (parent_id);
+            CREATE TABLE IF NOT EXISTS state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._connection.commit()
+
+    @property
+    def page_token(self):
+        """
+        Changes API page token from which the next update() starts, None if the index was never built.
+        """
+        return self._get_state('page_token')
+
+    @property
+    def root_id(self):
+        """
+        ID of the 'root' folder of the indexed drive.
+        """
+        return self._get_state('root_id')
+
+    def build(self, service, query="trashed = false"):
+        """
+        (Re)build the whole index from a full listing of the drive.
+        The Changes API start token is fetched before the listing, so nothing changed
+        during the listing is missed by the next update(). It is only stored once the listing
+        is complete : until then page_token is None and build() must be called again.
+        """
+        try:
+            page_token = execute(service.changes().getStartPageToken())['startPageToken']
+            root_id = execute(service.files().get(fileId='root', fields='id'))['id']
+        except errors.HttpError as error:
+            raise error
+
+        # The page token is cleared with the files : if the listing fails, the truncated index is not taken
+        # for a built one (page_token is None) and the next update() refuses to run on it
+        with self._lock:
+            self._connection.execute("DELETE FROM files")
+            self._connection.execute("DELETE FROM parents")
+            self._connection.execute("DELETE FROM state WHERE key = 'page_token'")
+            self._connection.commit()
+
+        batch = []
+        for item in iter_files(service, query=query, fields=INDEX_FIELDS, prefetch=True):
+            batch.append(item)
+            if len(batch) >= 1000:
+                self._store(batch)
+                batch = []
+        self._store(batch)
+
+        with self._lock:
+            self._set_state('root_id', root_id)
+            self._set_state('page_token', page_token)
+            self._connection.commit()
+
+    def update(self, service):
+        """
+        Apply to the index every change since the last build() / update().
+        Returns the number of changes applied.
+        """
+        page_token = self.page_token
+        if page_token is None:
+            raise ValueError("The index has never been built, call build() first")
+
+        changes = service.changes()
+        request = changes.list(pageToken=page_token,
+                               pageSize=1000,
+                               includeRemoved=True,
+                               fields="nextPageToken, newStartPageToken, "
+                                      "changes(fileId, removed, file({}))".format(INDEX_FIELDS))
+        count = 0
+        while request is not None:
+            try:
+                response = execute(request)
+            except errors.HttpError as error:
+                raise error
+
+            updated = []
+            removed = []
+            for change in response.get('changes', []):
+                item = change.get('file')
+                if change.get('removed') or item is None or item.get('trashed'):
+                    removed.append(change['fileId'])
+                else:
+                    updated.append(item)
+            self._remove(removed)
+            self._store(updated)
+            count += len(updated) + len(removed)
+
+            if 'newStartPageToken' in response:
+                with self._lock:
+                    self._set_state('page_token', response['newStartPageToken'])
+                    self._connection.commit()
+            request = changes.list_next(request, response)
+
+        return count
+
+    def get(self, file_id):
+        """
+        Return the indexed metadata of 'file_id', or None.
+        """
+        rows = self._query("SELECT * FROM files WHERE id = ?", (file_id,))
+        return rows[0] if rows else None
+
+    def find_by_name(self, name):
+        """
+        Return the list of the files named exactly 'name'.
+        """
+        return self._query("SELECT * FROM files WHERE name = ?", (name,))
+
+    def children(self, parent_id):
+        """
+        Return the list of the files whose parents contain 'parent_id' ('root' is accepted).
+        """
+        if parent_id == 'root':
+            parent_id = self.root_id
+        return self._query("SELECT files.* FROM files JOIN parents ON parents.file_id = files.id "
+                           "WHERE parents.parent_id = ?", (parent_id,))
+
+    def find_by_path(self, path, root_id='root'):
+        """
+        Return the file at 'path' ("folder/sub folder/file name") under 'root_id', or None.
+        If several files have the same name, the first one found is returned.
+        """
+        current = {'id': self.root_id if root_id == 'root' else root_id}
+        for name in [part for part in path.split('/') if part]:
+            rows = self._query("SELECT files.* FROM files JOIN parents ON parents.file_id = files.id "
+                               "WHERE parents.parent_id = ? AND files.name = ? LIMIT 1", (current['id'], name))
+            if not rows:
+                return None
+            current = rows[0]
+        return current
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _store(self, items):
+        if not items:
+            return
+        with self._lock:
+            ids = [(item['id'],) for item in items]
+            self._connection.executemany("DELETE FROM parents WHERE file_id = ?", ids)
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO files (id, name, mimeType, md5Checksum, modifiedTime, owners) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(item['id'], item.get('name'), item.get('mimeType'), item.get('md5Checksum'),
+                  item.get('modifiedTime'), json.dumps([owner.get('emailAddress') for owner in item.get('owners', [])]))
+                 for item in items])
+            self._connection.executemany("INSERT OR IGNORE INTO parents (file_id, parent_id) VALUES (?, ?)",
+                                         [(item['id'], parent_id)
+                                          for item in items for parent_id in item.get('parents', [])])
+            self._connection.commit()
+
+    def _remove(self, file_ids):
+        if not file_ids:
+            return
+        with self._lock:
+            ids = [(file_id,) for file_id in file_ids]
+            self._connection.executemany("DELETE FROM files WHERE id = ?", ids)
+            self._connection.executemany("DELETE FROM parents WHERE file_id = ?", ids)
+            self._connection.commit()
+
+    def _query(self, sql, parameters):
+        with self._lock:
+            cursor = self._connection.execute(sql, parameters)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            for row in rows:
+                row['owners'] = json.loads(row['owners']) if row['owners'] else []
+                row['parents'] = [parent_id for (parent_id,) in self._connection.execute(
+                    "SELECT parent_id FROM parents WHERE file_id = ?", (row['id'],))]
+        return rows
+
+    def _get_state(self, key):
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        # Must be called with self._lock held
+        self._connection.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
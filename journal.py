@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+import json
+import sqlite3
+import threading
+
+
+class Journal(object):
+    """
+    On-disk journal (SQLite file) of the items already created by a long job
+    (duplicate_tree, mkdir_gdrive...), so that a rerun of the same job skips them.
+    Each entry maps a key to the object created on GDRIVE : the ID of the copied item for duplicate_tree,
+    "<ID of the parent folder>/<folder name>" for mkdir_gdrive, so a mkdir_gdrive journal is tied to the
+    destination parent_id (rerunning with another parent_id creates everything again).
+    Entries are committed as soon as they are recorded.
+    Use one journal file per job : for example
+        with Journal("/tmp/copy_project.journal") as journal:
+            duplicate_tree(service, folder_to_copy, parent_id, [], journal=journal)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS entries "
+                                 "(key TEXT PRIMARY KEY, created TEXT NOT NULL)")
+        self._connection.commit()
+
+    def get(self, key):
+        """
+        Return the object recorded for 'key', or None if the item has not been created yet.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT created FROM entries WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record(self, key, created):
+        """
+        Record that 'created' (dict returned by the API) was created for 'key'.
+        """
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO entries (key, created) VALUES (?, ?)",
+                                     (key, json.dumps(created)))
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+import bisect
+import json
+import threading
+from collections import namedtuple
+
+# One executed API call, given to every hook :
+# - operation : API method ("drive.files.list", "sheets.spreadsheets.values.batchUpdate"...)
+# - start : time.time() when the call started
+# - latency : duration (seconds) of the call, retries and backoff included
+# - response_bytes : size of the body of the last response
+# - retries : number of retries (0 if the first attempt succeeded or failed for good)
+# - status : HTTP status of the last response, None if no response was received
+CallRecord = namedtuple('CallRecord', ['operation', 'start', 'latency', 'response_bytes', 'retries', 'status'])
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_hooks = []
+
+
+def add_hook(hook):
+    """
+    Call 'hook' with a CallRecord after every API call executed through execution.py, transfer.py or aio.py.
+    Hooks are called on the thread that executed the call and must be fast and thread-safe.
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def has_hooks():
+    return bool(_hooks)
+
+
+def record(operation, start, latency, response_bytes, retries, status):
+    """
+    Give a CallRecord to every hook.
+    """
+    call = CallRecord(operation, start, latency, response_bytes, retries, status)
+    for hook in list(_hooks):
+        hook(call)
+
+
+class _Histogram(object):
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        [(upper bound, number of values <= upper bound)...], the last bound being "+Inf"
+        """
+        total = 0
+        result = []
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics(object):
+    """
+    Hook aggregating the calls by operation : number of calls by HTTP status, retries,
+    latency and response size histograms. Can be dumped in the Prometheus text format or in JSON.
+        metrics = Metrics()
+        add_hook(metrics)
+        ...
+        print(metrics.to_prometheus())
+    """
+
+    def __init__(self, prefix="gsuite_api"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __call__(self, call):
+        with self._lock:
+            status = str(call.status) if call.status is not None else "none"
+            key = (call.operation, status)
+            self._calls[key] = self._calls.get(key, 0) + 1
+            self._retries[call.operation] = self._retries.get(call.operation, 0) + call.retries
+            if call.operation not in self._latency:
+                self._latency[call.operation] = _Histogram(LATENCY_BUCKETS)
+                self._bytes[call.operation] = _Histogram(BYTES_BUCKETS)
+            self._latency[call.operation].observe(call.latency)
+            self._bytes[call.operation].observe(call.response_bytes)
+
+    def reset(self):
+        with self._lock:
+            self._calls = {}
+            self._retries = {}
+            self._latency = {}
+            self._bytes = {}
+
+    def to_dict(self):
+        with self._lock:
+            operations = {}
+            for (operation, status), count in self._calls.items():
+                operations.setdefault(operation, {'calls': {}})['calls'][status] = count
+            for operation, entry in operations.items():
+                latency = self._latency[operation]
+                response_bytes = self._bytes[operation]
+                entry['retries'] = self._retries[operation]
+                entry['latency_seconds'] = {'sum': latency.sum, 'count': latency.count,
+                                            'buckets': [[str(bound), count]
+                                                        for bound, count in latency.cumulative()]}
+                entry['response_bytes'] = {'sum': response_bytes.sum, 'count': response_bytes.count,
+                                           'buckets': [[str(bound), count]
+                                                       for bound, count in response_bytes.cumulative()]}
+            return operations
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+    def to_prometheus(self):
+        with self._lock:
+            lines = [
+                "# HELP {}_calls_total API calls by operation and HTTP status.".format(self.prefix),
+                "# TYPE {}_calls_total counter".format(self.prefix),
+            ]
+            for (operation, status), count in sorted(self._calls.items()):
+                lines.append('{}_calls_total{{operation="{}",status="{}"}} {}'.format(self.prefix, operation,
+                                                                                   status, count))
+
+            lines += [
+                "# HELP {}_retries_total Retries of throttled or failed API calls.".format(self.prefix),
+                "# TYPE {}_retries_total counter".format(self.prefix),
+            ]
+            for operation, count in sorted(self._retries.items()):
+                lines.append('{}_retries_total{{operation="{}"}} {}'.format(self.prefix, operation, count))
+
+            for name, help_text, histograms in (
+                    ("call_duration_seconds", "Duration of the API calls, retries included.", self._latency),
+                    ("response_bytes", "Size of the API responses.", self._bytes)):
+                metric = "{}_{}".format(self.prefix, name)
+                lines += ["# HELP {} {}".format(metric, help_text), "# TYPE {} histogram".format(metric)]
+                for operation, histogram in sorted(histograms.items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append('{}_bucket{{operation="{}",le="{}"}} {}'.format(metric, operation, bound, count))
+                    lines.append('{}_sum{{operation="{}"}} {}'.format(metric, operation, histogram.sum))
+                    lines.append('{}_count{{operation="{}"}} {}'.format(metric, operation, histogram.count))
+
+            return "\n".join(lines) + "\n"
+
+
+class TracingHook(object):
+    """
+    Hook emitting an OpenTelemetry span for each call (requires opentelemetry-api).
+        add_hook(TracingHook())
+    """
+
+    def __init__(self, tracer=None):
+        from opentelemetry import trace
+        self._tracer = tracer or trace.get_tracer("gsuite-api")
+
+    def __call__(self, call):
+        start = int(call.start * 1e9)
+        span = self._tracer.start_span(call.operation, start_time=start)
+        span.set_attribute("http.status_code", call.status or 0)
+        span.set_attribute("gsuite_api.response_bytes", call.response_bytes)
+        span.set_attribute("gsuite_api.retries", call.retries)
+        span.end(end_time=start + int(call.latency * 1e9))
@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+import hashlib
+import io
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from apiclient import errors
+
+from crawler import TreeCrawler
+from drive import FOLDER_MIME_TYPE, bulk_execute, mkdir_gdrive
+from execution import execute
+from transfer import DEFAULT_CHUNK_SIZE, upload_files
+
+# Fields of the Drive items compared with the local files
+MIRROR_FIELDS = "id, name, mimeType, parents, md5Checksum, size, modifiedTime"
+
+# Size of the blocks read to compute the MD5 of a local file
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# One action of a sync :
+# - action : "mkdir", "upload" (new file), "update" (content changed) or "trash"
+# - path : path relative to the mirrored directory / folder ("docs/report.pdf")
+# - file_id : Drive item updated or trashed, created folder or file once done (None for a dry run)
+# - error : exception of the action (errors.HttpError, IOError for a local file...), None if it succeeded
+#   (or for a dry run)
+MirrorAction = namedtuple('MirrorAction', ['action', 'path', 'file_id', 'error'])
+
+
+class HashCache(object):
+    """
+    MD5 of local files, kept in a JSON file between runs and keyed by path. An entry is reused as long as
+    the size and the modification time of the file do not change, so only new and modified files are read.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        if path and os.path.exists(path):
+            with io.open(path, encoding='utf-8') as cache_file:
+                self._entries = json.load(cache_file)
+
+    def md5(self, path, size, mtime):
+        """
+        Return the MD5 of the file 'path', computing it only if the cached one is out of date.
+        """
+        entry = self._entries.get(path)
+        if entry is not None and entry['size'] == size and entry['mtime'] == mtime:
+            return entry['md5']
+
+        digest = hashlib.md5()
+        with io.open(path, 'rb') as local_file:
+            for block in iter(lambda: local_file.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        self._entries[path] = {'size': size, 'mtime': mtime, 'md5': digest.hexdigest()}
+        return self._entries[path]['md5']
+
+    def keep_only(self, paths):
+        """
+        Forget the files that are not in 'paths' anymore.
+        """
+        paths = set(paths)
+        self._entries = {path: entry for path, entry in self._entries.items() if path in paths}
+
+    def save(self):
+        if not self.path:
+            return
+        temporary_path = self.path + ".tmp"
+        with io.open(temporary_path, 'w', encoding='utf-8') as cache_file:
+            cache_file.write(json.dumps(self._entries))
+        os.replace(temporary_path, self.path)
+
+
+def _modified_time(mtime):
+    """
+    RFC 3339 modifiedTime (milliseconds, as stored by Drive) of the local modification time 'mtime' (ns).
+    """
+    return "{}.{:03d}Z".format(time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(mtime // 10 ** 9)),
+                               mtime // 10 ** 6 % 1000)
+
+
+class DriveSnapshot(object):
+    """
+    Items of a Drive folder subtree, kept in a JSON file between runs with the Changes API page token
+    of the time they were fetched : the folder is crawled once, then each refresh() only downloads
+    the changes since the previous one.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.folder_id = None
+        self.root_id = None
+        self.page_token = None
+        # ID -> item (MIRROR_FIELDS) of every item of the subtree
+        self.items = {}
+        if path and os.path.exists(path):
+            with io.open(path, encoding='utf-8') as snapshot_file:
+                state = json.load(snapshot_file)
+            self.folder_id, self.root_id = state['folder_id'], state['root_id']
+            self.page_token, self.items = state['page_token'], state['items']
+
+    def refresh(self, service, folder_id):
+        """
+        Bring the snapshot of the folder 'folder_id' up to date and return its items as {path: item},
+        paths being relative to the folder ("docs/report.pdf").
+        """
+        try:
+            if self.folder_id != folder_id or self.page_token is None:
+                self.folder_id, self.items = folder_id, {}
+                self.root_id = folder_id
+                if folder_id == 'root':
+                    self.root_id = execute(service.files().get(fileId='root', fields='id'))['id']
+                self.page_token = execute(service.changes().getStartPageToken())['startPageToken']
+                self._crawl(service, self.root_id)
+            else:
+                self._apply_changes(service)
+        except errors.HttpError as error:
+            raise error
+        return self._paths()
+
+    def _crawl(self, service, folder_id):
+        for _, item in TreeCrawler(service, folder_id, fields=MIRROR_FIELDS):
+            self.items[item['id']] = item
+
+    def _apply_changes(self, service):
+        changes = service.changes()
+        request = changes.list(pageToken=self.page_token, pageSize=1000, includeRemoved=True,
+                               fields="nextPageToken, newStartPageToken, "
+                                      "changes(fileId, removed, file({}, trashed))".format(MIRROR_FIELDS))
+        known_folders = set(item_id for item_id, item in self.items.items() if item['mimeType'] == FOLDER_MIME_TYPE)
+        while request is not None:
+            response = execute(request)
+            for change in response.get('changes', []):
+                item = change.get('file')
+                if change.get('removed') or item is None or item.get('trashed'):
+                    self.items.pop(change['fileId'], None)
+                else:
+                    # Kept even if outside of the subtree for now : its parent may be in a later change
+                    item.pop('trashed', None)
+                    self.items[item['id']] = item
+            if 'newStartPageToken' in response:
+                self.page_token = response['newStartPageToken']
+            request = changes.list_next(request, response)
+
+        self.items = {item['id']: item for item in self._paths().values()}
+        # The content of a folder moved into the subtree is not in the changes : it is crawled
+        for folder_id in [item_id for item_id, item in self.items.items()
+                          if item['mimeType'] == FOLDER_MIME_TYPE and item_id not in known_folders]:
+            self._crawl(service, folder_id)
+
+    def _paths(self):
+        children = {}
+        for item in self.items.values():
+            for parent_id in item.get('parents', []):
+                children.setdefault(parent_id, []).append(item)
+        paths = {}
+        pending = [(self.root_id, "")]
+        while pending:
+            parent_id, prefix = pending.pop()
+            for item in children.get(parent_id, []):
+                path = prefix + item['name']
+                paths[path] = item
+                if item['mimeType'] == FOLDER_MIME_TYPE:
+                    pending.append((item['id'], path + "/"))
+        return paths
+
+    def save(self):
+        if not self.path:
+            return
+        temporary_path = self.path + ".tmp"
+        with io.open(temporary_path, 'w', encoding='utf-8') as snapshot_file:
+            snapshot_file.write(json.dumps({'folder_id': self.folder_id, 'root_id': self.root_id,
+                                            'page_token': self.page_token, 'items': self.items}))
+        os.replace(temporary_path, self.path)
+
+
+class Mirror(object):
+    """
+    One-way mirror of the local directory 'local_root' into the Drive folder 'folder_id' : after sync(),
+    the folder contains the same tree of folders and files as the directory.
+        mirror = Mirror(service, "/data/reports", folder_id, cache_file="/var/cache/reports.md5.json",
+                        snapshot_file="/var/cache/reports.drive.json")
+        actions = mirror.sync()
+    The Drive folder is crawled once (crawler.TreeCrawler), then kept up to date in 'snapshot_file' with the
+    Changes API (cf DriveSnapshot). Uploaded files get the modification time of the local file as modifiedTime :
+    a file whose size and modification time are the ones of its Drive item is unchanged. The others are compared
+    by MD5 with the md5Checksum of the item, their MD5 coming from 'cache_file' (cf HashCache) unless they
+    changed since the last run, so unchanged files are never read.
+    Only the differences are sent : missing folders are created (drive.mkdir_gdrive), new and modified files
+    are uploaded 'max_workers' at a time (transfer.upload_files), and the items that are not in the directory
+    anymore are trashed through batch requests if 'trash_extra' is True.
+    Google documents (no md5Checksum) having the name of a local file are left untouched.
+    """
+
+    def __init__(self, service, local_root, folder_id, cache_file=None, snapshot_file=None, max_workers=4,
+                 trash_extra=True, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.service = service
+        self.local_root = local_root
+        self.folder_id = folder_id
+        self.cache = HashCache(cache_file)
+        self.snapshot = DriveSnapshot(snapshot_file)
+        self.max_workers = max_workers
+        self.trash_extra = trash_extra
+        self.chunk_size = chunk_size
+        # State of the last plan(), used by sync()
+        self._files = {}
+        self._remote = {}
+
+    def _scan(self):
+        """
+        Return (set of the local directories, {path: (absolute path, size, mtime)} of the local files),
+        with paths relative to local_root and separated by "/".
+        """
+        directories = set()
+        files = {}
+        for directory, subdirectories, filenames in os.walk(self.local_root):
+            relative = os.path.relpath(directory, self.local_root)
+            prefix = "" if relative == "." else relative.replace(os.sep, "/") + "/"
+            directories.update(prefix + name for name in subdirectories)
+            for name in filenames:
+                absolute = os.path.join(directory, name)
+                stat = os.stat(absolute)
+                files[prefix + name] = (absolute, stat.st_size, stat.st_mtime_ns)
+        return directories, files
+
+    def _hash_all(self, files, paths):
+        def md5(path):
+            absolute, size, mtime = files[path]
+            return self.cache.md5(absolute, size, mtime)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            hashes = dict(zip(paths, executor.map(md5, paths)))
+        self.cache.keep_only(absolute for absolute, _, _ in files.values())
+        return hashes
+
+    def plan(self):
+        """
+        Compare the directory and the folder and return the MirrorAction list of a sync (without any error
+        or file_id for the items to create). Nothing is modified on Drive.
+        """
+        directories, files = self._scan()
+        remote = self.snapshot.refresh(self.service, self.folder_id)
+        self.snapshot.save()
+        self._files, self._remote = files, remote
+
+        # Only the files whose size or modification time differ from their Drive item are read
+        compared = []
+        for path, (_, size, mtime) in sorted(files.items()):
+            item = remote.get(path)
+            if item is not None and 'md5Checksum' in item \
+                    and (item.get('size') != str(size) or item.get('modifiedTime') != _modified_time(mtime)):
+                compared.append(path)
+        hashes = self._hash_all(files, compared)
+        self.cache.save()
+
+        actions = []
+        trashed = set()
+        for path, item in sorted(remote.items()):
+            is_folder = item['mimeType'] == FOLDER_MIME_TYPE
+            expected = path in directories if is_folder else path in files
+            if expected or not self.trash_extra:
+                continue
+            if is_folder:
+                trashed.add(path)
+            # Trashing a folder trashes its content : only the topmost extra items are trashed
+            if path.rpartition("/")[0] not in trashed:
+                actions.append(MirrorAction("trash", path, item['id'], None))
+
+        for path in sorted(directories):
+            item = remote.get(path)
+            if item is None or item['mimeType'] != FOLDER_MIME_TYPE:
+                actions.append(MirrorAction("mkdir", path, None, None))
+
+        for path in sorted(files):
+            item = remote.get(path)
+            if item is None or item['mimeType'] == FOLDER_MIME_TYPE:
+                actions.append(MirrorAction("upload", path, None, None))
+            elif path in hashes and item['md5Checksum'] != hashes[path]:
+                actions.append(MirrorAction("update", path, item['id'], None))
+        return actions
+
+    def sync(self, dry_run=False):
+        """
+        Mirror the directory into the folder and return the list of MirrorAction done,
+        or only planned if 'dry_run' is True (cf plan).
+        """
+        actions = self.plan()
+        if dry_run:
+            return actions
+        done = []
+
+        trash = [action for action in actions if action.action == "trash"]
+        for action, (_, error) in zip(trash, bulk_execute(self.service, [("trash_file", {'file_id': action.file_id})
+                                                                         for action in trash])):
+            done.append(action._replace(error=error))
+
+        trashed = set(action.path for action in trash)
+        folder_ids = {"": self.folder_id}
+        folder_ids.update((path, item['id']) for path, item in self._remote.items()
+                          if item['mimeType'] == FOLDER_MIME_TYPE and path not in trashed)
+        folder_errors = {}
+        done.extend(self._make_folders([action.path for action in actions if action.action == "mkdir"],
+                                       folder_ids, folder_errors))
+
+        transfers = []
+        items = []
+        for action in actions:
+            if action.action not in ("upload", "update"):
+                continue
+            parent, _, name = action.path.rpartition("/")
+            if parent not in folder_ids:
+                done.append(action._replace(error=folder_errors[parent]))
+                continue
+            source, _, mtime = self._files[action.path]
+            item = {'source': source, 'chunk_size': self.chunk_size, 'modified_time': _modified_time(mtime)}
+            if action.action == "update":
+                item['file_id'] = action.file_id
+            else:
+                item.update(name=name, parent_id=folder_ids[parent])
+            transfers.append(action)
+            items.append(item)
+        for action, (response, error) in zip(transfers, upload_files(self.service, items, self.max_workers)):
+            done.append(action._replace(file_id=response['id'] if response else action.file_id, error=error))
+        return done
+
+    def _make_folders(self, paths, folder_ids, folder_errors):
+        """
+        Create the folders 'paths' (parents first), updating 'folder_ids' ({path: ID}) with them,
+        and 'folder_errors' ({path: error}) with the ones that could not be created.
+        """
+        # Each missing folder is created under its closest existing ancestor, with the folders below it
+        trees = {}
+        anchored = {}
+        for path in paths:
+            parts = path.split("/")
+            anchor = "/".join(parts[:max(index for index in range(len(parts))
+                                         if "/".join(parts[:index]) in folder_ids)])
+            tree = trees.setdefault(anchor, {})
+            for part in parts[len(anchor.split("/")) if anchor else 0:]:
+                tree = tree.setdefault(part, {})
+            anchored.setdefault(anchor, []).append(path)
+
+        done = []
+        for anchor, tree in trees.items():
+            prefix = anchor + "/" if anchor else ""
+            try:
+                created = mkdir_gdrive(self.service, tree, folder_ids[anchor])
+            except errors.HttpError as error:
+                for path in anchored[anchor]:
+                    folder_errors[path] = error
+                    done.append(MirrorAction("mkdir", path, None, error))
+                continue
+            for path, folder_id in created.items():
+                folder_ids[prefix + path] = folder_id
+                done.append(MirrorAction("mkdir", prefix + path, folder_id, None))
+        return done
@@ -1,7 +1,11 @@
 #!/usr/bin/env python
 # coding: utf8
 
-import os
+import json
+import threading
+import time
+from collections import OrderedDict
+
 from googleapiclient.discovery import build
 from google.oauth2 import service_account
 
@@ -11,8 +15,106 @@ from google.oauth2 import service_account
 # Path to the downloaded json credentials of your service account (see google documentation and ReadMe)
 SERVICE_ACCOUNT_CREDENTIALS_FILE = "/path/to/credentials.json"
 
+# Version used for each available API
+API_VERSIONS = {
+    'drive': 'v3',
+    'sheets': 'v4',
+}
+
+
+class ServicePool(object):
+    """
+    Cache of Google services, keyed by (api, scopes, user_email).
+    - The credentials file is read and parsed once, and the delegated credentials of each user
+    are kept (with their access token) so they are not rebuilt and refreshed on every call.
+    - Services are built from the discovery documents bundled with googleapiclient (no network call).
+    - Each thread gets its own service instance, because the httplib2 transport is not thread-safe.
+    - Entries unused for 'ttl' seconds are evicted, and the least recently used ones are evicted
+    when there are more than 'max_size' of them.
+    """
+
+    def __init__(self, credentials_file=None, max_size=256, ttl=3600):
+        self.credentials_file = credentials_file
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._infos = {}
+        self._credentials = OrderedDict()
+        self._services = OrderedDict()
+
+    def get(self, scopes, api, user_email=None):
+        """
+        Return the service of the current thread for 'api', 'scopes' and 'user_email'
+        (cf get_service for the parameters), building it if needed.
+        """
+        if api not in API_VERSIONS:
+            raise ValueError("'{}' not in {}".format(api, tuple(API_VERSIONS)))
+
+        scopes = tuple(sorted(scopes))
+        key = (api, scopes, user_email, threading.current_thread().ident)
+        now = time.time()
+
+        with self._lock:
+            self._evict(self._services, now)
+            entry = self._services.pop(key, None)
+            if entry is not None:
+                self._services[key] = (entry[0], now)
+                return entry[0]
+            credentials = self._get_credentials(scopes, user_email, now)
+
+        # build() is slow enough to be done outside of the lock
+        service = build(api, API_VERSIONS[api], credentials=credentials,
+                        cache_discovery=False, static_discovery=True)
+
+        with self._lock:
+            self._services[key] = (service, now)
+            self._evict(self._services, now)
+        return service
 
-def get_service(scopes, api, user_email=None):
+    def clear(self):
+        """
+        Drop every cached credentials and service.
+        """
+        with self._lock:
+            self._infos.clear()
+            self._credentials.clear()
+            self._services.clear()
+
+    def _get_credentials(self, scopes, user_email, now):
+        # Must be called with self._lock held
+        self._evict(self._credentials, now)
+        key = (scopes, user_email)
+        entry = self._credentials.pop(key, None)
+        if entry is None:
+            credentials = service_account.Credentials.from_service_account_info(self._get_info(),
+                                                                                scopes=list(scopes))
+            if user_email:
+                credentials = credentials.with_subject(user_email)
+            entry = (credentials, now)
+        self._credentials[key] = (entry[0], now)
+        return entry[0]
+
+    def _get_info(self):
+        # Must be called with self._lock held
+        path = self.credentials_file or SERVICE_ACCOUNT_CREDENTIALS_FILE
+        if path not in self._infos:
+            with open(path) as credentials_file:
+                self._infos[path] = json.load(credentials_file)
+        return self._infos[path]
+
+    def _evict(self, entries, now):
+        # entries are ordered from the least to the most recently used
+        while entries:
+            key, (_, last_used) = next(iter(entries.items()))
+            if len(entries) <= self.max_size and now - last_used <= self.ttl:
+                break
+            del entries[key]
+
+
+_default_pool = ServicePool()
+
+
+def get_service(scopes, api, user_email=None, pool=None):
     """
     Build Google service depends on scopes and API you need
     @param scopes: list of Google scopes you need for your service
@@ -21,23 +123,8 @@ def get_service(scopes, api, user_email=None):
     @param api: Only compatible with "drive" or "sheet" for now.
     @param user_email: If you want to access a specific user's datas, you can specify his email (it should be in your
     GSuite domain). Else, function will return Google service of your service account.
+    @param pool: ServicePool used to cache the services. By default, a pool shared by the whole process.
     @return: Google service for your service account, or for a specific user if user_email parameter was filled in.
+    The same service is returned to the same thread on later calls (cf ServicePool).
     """
-    available_api = ('drive', 'sheets')
-    if api not in available_api:
-        raise ValueError("'{}' not in {}".format(api, available_api))
-
-    credentials_service_account = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_CREDENTIALS_FILE,
-        scopes=scopes)
-    credentials = credentials_service_account
-
-    if user_email:
-        credentials = credentials_service_account.with_subject(user_email)
-
-    if api == "drive":
-        service = build('drive', 'v3', credentials=credentials)
-    else:  # api == "sheets"
-        service = build('sheets', 'v4', credentials=credentials)
-
-    return service
+    return (pool or _default_pool).get(scopes, api, user_email=user_email)
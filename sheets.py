@@ -2,8 +2,32 @@
 # coding: utf8
 
 from __future__ import print_function
+import array
+import copy
+import json
+import math
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from apiclient import errors
 
+from execution import execute, thread_http
+
+# Maximum size (bytes of JSON) of the values sent by one request of spreadsheet_write_rows
+MAX_PAYLOAD_BYTES = 2 * 1024 * 1024
+
+
+def _update_cells_request(service, spreadsheetId, range_, valuesList, value_input_option='RAW'):
+    value_range_body = {"values": [valuesList]}
+
+    return service.spreadsheets().values().update(spreadsheetId=spreadsheetId,
+                                                  range=range_,
+                                                  valueInputOption=value_input_option,
+                                                  body=value_range_body)
+
 
 def spreadsheet_update_cells(service, spreadsheetId, range_, valuesList):
     """
@@ -20,18 +44,131 @@ def spreadsheet_update_cells(service, spreadsheetId, range_, valuesList):
 
     value_input_option = 'RAW'
 
-    value_range_body = {"values": [valuesList]}
-
     try:
-        response = service.spreadsheets().values().update(spreadsheetId=spreadsheetId,
-                                                          range=range_,
-                                                          valueInputOption=value_input_option,
-                                                          body=value_range_body).execute()
+        response = execute(_update_cells_request(service, spreadsheetId, range_, valuesList, value_input_option))
         return response
     except errors.HttpError as error:
         raise error
 
 
+def _parse_cell(range_):
+    """
+    Split a start cell "NomDeLaFeuille!B10" into ("NomDeLaFeuille", "B", 10).
+    The row defaults to 1 when only the column is given ("Feuille_1!B").
+    """
+    sheet, _, cell = range_.rpartition('!')
+    match = re.match(r'^([A-Za-z]*)(\d*)$', cell)
+    if match is None:
+        raise ValueError("'{}' is not a start cell like 'Sheet!A1'".format(range_))
+    return sheet, match.group(1).upper() or 'A', int(match.group(2) or 1)
+
+
+def _to_cell(value):
+    """
+    Convert 'value' into a JSON-compatible cell value (NumPy scalars, NaN, None...).
+    """
+    if hasattr(value, 'item') and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return value
+
+
+def _iter_rows(rows, header):
+    """
+    Iterate over the rows of 'rows' as lists of cell values. 'rows' can be any iterable of rows
+    (list of lists, csv.reader, generator, 2D NumPy array) or a columnar mapping
+    {column name: sequence of values} (dict of lists or arrays, pandas DataFrame).
+    """
+    if hasattr(rows, 'keys') and callable(rows.keys):
+        columns = list(rows.keys())
+        if header:
+            yield [_to_cell(column) for column in columns]
+        rows = zip(*[rows[column] for column in columns])
+    for row in rows:
+        yield [_to_cell(value) for value in row]
+
+
+def spreadsheet_write_rows(service, spreadsheet_id, range_, rows, value_input_option='RAW', header=True,
+                           max_bytes=MAX_PAYLOAD_BYTES, max_workers=1):
+    """
+    Ecrit un tableau 2D dans un spreadsheet, à partir de la cellule 'range_' (ex: Feuille_1!A1).
+    Contrairement à spreadsheet_update_cells (une ligne par appel), les lignes sont regroupées en blocs
+    d'au plus 'max_bytes' octets de JSON, chaque bloc étant envoyé par un seul appel à values.batchUpdate.
+    - rows : lignes à écrire, cf _iter_rows (liste de listes, csv.reader, générateur, tableau NumPy,
+    ou colonnes {nom: valeurs} comme un dict ou un DataFrame pandas). Les lignes sont lues au fur et à mesure.
+    - header : pour des colonnes {nom: valeurs}, écrit aussi le nom des colonnes en première ligne.
+    - value_input_option : 'RAW' ou 'USER_ENTERED' (cf spreadsheet_update_cells)
+    - max_workers : nombre de blocs envoyés en parallèle.
+    Retourne la liste des réponses, dans l'ordre des blocs.
+    """
+    sheet, column, row_index = _parse_cell(range_)
+    prefix = "{}!".format(sheet) if sheet else ""
+
+    def chunks():
+        start = row_index
+        values = []
+        size = 0
+        for row in _iter_rows(rows, header):
+            row_size = len(json.dumps(row))
+            if values and size + row_size > max_bytes:
+                yield start, values
+                start += len(values)
+                values = []
+                size = 0
+            values.append(row)
+            size += row_size
+        if values:
+            yield start, values
+
+    def send(chunk):
+        start, values = chunk
+        body = {
+            'valueInputOption': value_input_option,
+            'data': [{'range': "{}{}{}".format(prefix, column, start), 'values': values}],
+        }
+        try:
+            return execute(service.spreadsheets().values().batchUpdate(spreadsheetId=spreadsheet_id, body=body),
+                           http=thread_http(service) if max_workers > 1 else None)
+        except errors.HttpError as error:
+            raise error
+
+    if max_workers <= 1:
+        return [send(chunk) for chunk in chunks()]
+
+    responses = []
+    pending = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk in chunks():
+            # At most 2 * max_workers blocks in memory
+            if len(pending) >= 2 * max_workers:
+                responses.append(pending.pop(0).result())
+            pending.append(executor.submit(send, chunk))
+        responses.extend(future.result() for future in pending)
+    return responses
+
+
+def _protect_request(sheet_id, warningOnly, requestingUserCanEdit, UsersList, position=None):
+    protect_range = {"sheetId": sheet_id}
+
+    if position is not None:
+        protect_range["startRowIndex"] = position[0]
+        protect_range["endRowIndex"] = position[1]
+        protect_range["startColumnIndex"] = position[2]
+        protect_range["endColumnIndex"] = position[3]
+
+    return {
+        "addProtectedRange": {
+            "protectedRange": {
+                "range": protect_range,
+                "description": "Protected with Project Manager",
+                "warningOnly": warningOnly,
+                "requestingUserCanEdit": requestingUserCanEdit,
+                "editors": {"users": UsersList}}
+        }
+    }
+
+
 def protect_spreadsheet_element(service,
                                 sheet_id,
                                 spreadsheet_id,
@@ -50,54 +187,32 @@ def protect_spreadsheet_element(service,
     - **kwargs : You can give the 'position' parameter. It must be a tuple with 4 int value.
     position = (startRowIndex, endRowIndex, startColumnIndex, endColumnIndex)
     If you don't use this parameter, the entire sheet will be protect.
+    To send several protections in one call, see SpreadsheetBatch.
     """
 
-    protect_range = {"sheetId": sheet_id}
-
-    for key, value in kwargs.items():
-        if key == "position":
-            protect_range["startRowIndex"] = value[0]
-            protect_range["endRowIndex"] = value[1]
-            protect_range["startColumnIndex"] = value[2]
-            protect_range["endColumnIndex"] = value[3]
-
     body = {
         "requests": [
-            {
-                "addProtectedRange": {
-                    "protectedRange": {
-                        "range": protect_range,
-                        "description": "Protected with Project Manager",
-                        "warningOnly": warningOnly,
-                        "requestingUserCanEdit": requestingUserCanEdit,
-                        "editors": {"users": UsersList}}
-                }
-            }
+            _protect_request(sheet_id, warningOnly, requestingUserCanEdit, UsersList, kwargs.get("position"))
             ]
         }
 
     try:
-        response = service.spreadsheets().batchUpdate(
+        response = execute(service.spreadsheets().batchUpdate(
             spreadsheetId=spreadsheet_id,
-            body=body).execute()
+            body=body))
         return response
     except errors.HttpError as error:
         raise error
 
 
-def hide_spreadsheet_column(service, spreadsheet_id, sheet_id, column_index, hiddenByUser):
-    """
-    Permet de masquer ou afficher une colonne d'un spreadhseet.
-    Attention, la première colonne (colonne A) à pour index 0 et non pas 1
-    HiddenByUser : True ou False
-    """
-    requests = {
+def _hide_columns_request(sheet_id, start_index, end_index, hiddenByUser):
+    return {
         'updateDimensionProperties': {
             "range": {
                 "sheetId": sheet_id,
                 "dimension": 'COLUMNS',
-                "startIndex": column_index,
-                "endIndex": column_index + 1,
+                "startIndex": start_index,
+                "endIndex": end_index,
                 },
             "properties": {
                 "hiddenByUser": hiddenByUser,
@@ -106,29 +221,51 @@ def hide_spreadsheet_column(service, spreadsheet_id, sheet_id, column_index, hid
             }
         }
 
-    body = {'requests': requests}
+
+def hide_spreadsheet_column(service, spreadsheet_id, sheet_id, column_index, hiddenByUser):
+    """
+    Permet de masquer ou afficher une colonne d'un spreadhseet.
+    Attention, la première colonne (colonne A) à pour index 0 et non pas 1
+    HiddenByUser : True ou False
+    Pour masquer plusieurs colonnes en un seul appel, voir SpreadsheetBatch.hide_columns.
+    """
+    body = {'requests': [_hide_columns_request(sheet_id, column_index, column_index + 1, hiddenByUser)]}
 
     try:
-        response = service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id,
-                                                      body=body).execute()
+        response = execute(service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id,
+                                                              body=body))
         return response
     except errors.HttpError as error:
         raise error
 
 
-def get_spreadsheet_info(service, spreadsheet_id, ranges):
+def _spreadsheet_info_request(service, spreadsheet_id, ranges, include_grid_data=True, fields=None):
+    kwargs = {}
+    if fields:
+        kwargs['fields'] = fields
+
+    return service.spreadsheets().get(spreadsheetId=spreadsheet_id,
+                                      ranges=ranges,
+                                      includeGridData=include_grid_data,
+                                      **kwargs)
+
+
+def get_spreadsheet_info(service, spreadsheet_id, ranges, include_grid_data=True, fields=None, cache=None):
     # "ranges" s'écrit sous la forme ["my sheet!D9:D10", "my sheet!E12:E18"]
+    # Pour lire seulement les valeurs des cellules, get_spreadsheet_values / iter_spreadsheet_values
+    # sont beaucoup plus légères (pas de mise en forme).
 
-    # True if grid data should be returned.
-    # This parameter is ignored if a field mask was set in the request.
-    include_grid_data = True  # True if grid data should be returned
+    # include_grid_data : True if grid data should be returned.
+    # This parameter is ignored if a field mask was set in the request ('fields', for example
+    # "sheets(properties(sheetId,title))").
 
-    request = service.spreadsheets().get(spreadsheetId=spreadsheet_id,
-                                         ranges=ranges,
-                                         includeGridData=include_grid_data)
+    # cache : cache.ResponseCache optionnel, la réponse en cache est revalidée par son ETag.
+    request = _spreadsheet_info_request(service, spreadsheet_id, ranges, include_grid_data, fields)
 
     try:
-        response = request.execute()
+        if cache is not None:
+            return cache.execute(request)
+        response = execute(request)
 
         # return full response but can be parsed. response is a 'dict'
         return response
@@ -136,30 +273,385 @@ def get_spreadsheet_info(service, spreadsheet_id, ranges):
         raise error
 
 
-def add_spreadsheet_sheet(service, spreadsheet_id, sheet_name, column_nb, row_nb):
-    # "ranges" s'écrit sous la forme ["my sheet!D9:D10", "my sheet!E12:E18"]
+def _column_letters(index):
+    """
+    1 -> "A", 26 -> "Z", 27 -> "AA"
+    """
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
 
-    # True if grid data should be returned.
-    # This parameter is ignored if a field mask was set in the request.
-    body = {
-        "requests": [
-            {
-                "addSheet": {
-                    "properties": {
-                        "title": sheet_name,
-                        "gridProperties": {
-                            "rowCount": row_nb,
-                            "columnCount": column_nb
-                            }
-                        }
+
+def _to_columns(rows):
+    """
+    Transpose 'rows' into a list of columns. A column containing only numbers is an array.array
+    ('q' for integers, 'd' for floats), which is much more compact than a list ; other columns are lists.
+    Missing cells at the end of short rows are None.
+    """
+    width = max([len(row) for row in rows] or [0])
+    columns = []
+    for index in range(width):
+        column = [row[index] if index < len(row) else None for row in rows]
+        if column and all(isinstance(value, int) and not isinstance(value, bool) for value in column):
+            typecode = 'q'
+        elif column and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in column):
+            typecode = 'd'
+        else:
+            typecode = None
+
+        if typecode is not None:
+            try:
+                column = array.array(typecode, column)
+            except OverflowError:
+                pass
+        columns.append(column)
+    return columns
+
+
+def _values_request(service, spreadsheet_id, ranges, value_render_option='UNFORMATTED_VALUE'):
+    return service.spreadsheets().values().batchGet(spreadsheetId=spreadsheet_id,
+                                                    ranges=ranges,
+                                                    majorDimension='ROWS',
+                                                    valueRenderOption=value_render_option,
+                                                    fields="valueRanges(values)")
+
+
+def _values_from_response(response, columnar=False):
+    values = [value_range.get('values', []) for value_range in response.get('valueRanges', [])]
+    if columnar:
+        return [_to_columns(rows) for rows in values]
+    return values
+
+
+def get_spreadsheet_values(service, spreadsheet_id, ranges, value_render_option='UNFORMATTED_VALUE',
+                           columnar=False):
+    """
+    Lit les valeurs (seulement) de plusieurs plages en un seul appel à values.batchGet.
+    - ranges : liste de plages, ex: ["my sheet!D9:D10", "my sheet!E12:E18"]
+    - value_render_option : 'FORMATTED_VALUE', 'UNFORMATTED_VALUE' ou 'FORMULA'
+    - columnar : si True, chaque plage est retournée par colonnes (cf _to_columns) au lieu de lignes.
+    Retourne une liste (une entrée par plage, dans l'ordre de 'ranges') de listes de lignes ou de colonnes.
+    """
+    try:
+        response = execute(_values_request(service, spreadsheet_id, ranges, value_render_option))
+    except errors.HttpError as error:
+        raise error
+
+    return _values_from_response(response, columnar)
+
+
+def iter_spreadsheet_values(service, spreadsheet_id, range_, value_render_option='UNFORMATTED_VALUE',
+                            block_rows=5000, blocks_per_call=4):
+    """
+    Générateur qui retourne une à une les lignes (listes de valeurs) de la plage 'range_'
+    (ex: "my sheet!A2:F", "my sheet!B:D", "my sheet!B5" ou "my sheet"). La plage est lue par blocs de 'block_rows' lignes,
+    'blocks_per_call' blocs par appel à values.batchGet : seul un appel est en mémoire à la fois.
+    Comme pour l'API, les cellules vides en fin de ligne sont omises, une ligne vide est une liste vide
+    et les lignes vides en fin de plage ne sont pas retournées.
+    """
+    sheet, _, cells = range_.rpartition('!')
+    if not sheet:
+        sheet, cells = cells, ""
+    match = re.match(r'^([A-Za-z]*)(\d*)(?::([A-Za-z]*)(\d*))?$', cells)
+    if match is None:
+        raise ValueError("'{}' is not a range like 'Sheet!A2:F'".format(range_))
+    start_column, start_row, end_column, end_row = match.groups()
+    if cells and ':' not in cells:
+        # Une seule cellule ("B5") comme pour l'API, ou une colonne ("B") / une ligne ("5") entière
+        end_column, end_row = start_column, start_row
+    start_column = start_column or 'A'
+    start_row = int(start_row or 1)
+    if not sheet.startswith("'"):
+        sheet = "'{}'".format(sheet.replace("'", "''"))
+
+    if not end_column or not end_row:
+        grid = get_spreadsheet_info(service, spreadsheet_id, [sheet], include_grid_data=False,
+                                    fields="sheets(properties(gridProperties(rowCount,columnCount)))")
+        grid = grid['sheets'][0]['properties']['gridProperties']
+        end_column = end_column or _column_letters(grid['columnCount'])
+        end_row = end_row or grid['rowCount']
+    end_row = int(end_row)
+
+    blocks = ["{}!{}{}:{}{}".format(sheet, start_column, row, end_column, min(row + block_rows - 1, end_row))
+              for row in range(start_row, end_row + 1, block_rows)]
+
+    # Lignes vides à la fin du bloc précédent, retournées seulement si d'autres lignes suivent
+    missing_rows = 0
+    for index in range(0, len(blocks), blocks_per_call):
+        for values in get_spreadsheet_values(service, spreadsheet_id, blocks[index:index + blocks_per_call],
+                                             value_render_option=value_render_option):
+            if values:
+                for _ in range(missing_rows):
+                    yield []
+                missing_rows = 0
+                for row in values:
+                    yield row
+            missing_rows += block_rows - len(values)
+
+
+def _add_sheet_request(sheet_name, column_nb, row_nb):
+    return {
+        "addSheet": {
+            "properties": {
+                "title": sheet_name,
+                "gridProperties": {
+                    "rowCount": row_nb,
+                    "columnCount": column_nb
                     }
                 }
+            }
+        }
+
+
+def add_spreadsheet_sheet(service, spreadsheet_id, sheet_name, column_nb, row_nb):
+    body = {
+        "requests": [
+            _add_sheet_request(sheet_name, column_nb, row_nb)
             ]
         }
 
     try:
-        response = service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id,
-                                                      body=body).execute()
+        response = execute(service.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id,
+                                                              body=body))
         return response
     except errors.HttpError as error:
         raise error
+
+
+class BatchOperation(object):
+    """
+    Operation queued in a SpreadsheetBatch. 'reply' is set, once the batch is flushed, to the reply of the API
+    for this operation (operations merged together share the same reply).
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.reply = None
+
+
+class SpreadsheetBatch(object):
+    """
+    Collect structural edits of a spreadsheet and send them all in a single spreadsheets.batchUpdate call,
+    on flush() or at the end of a 'with' block :
+        with SpreadsheetBatch(service, spreadsheet_id) as batch:
+            batch.add_sheet("Report", column_nb=20, row_nb=1000)
+            for column_index in range(10, 40):
+                batch.hide_column(sheet_id, column_index)
+    An update of dimension properties is merged into the previous request when it sets the same properties on an
+    adjacent or overlapping range (the 30 hide_column above become one request).
+    """
+
+    def __init__(self, service, spreadsheet_id):
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        # Pending requests, with the operations answered by each of them
+        self._requests = []
+
+    def add(self, request):
+        """
+        Queue any batchUpdate request (dict like {"addSheet": {...}}) and return its BatchOperation.
+        """
+        operation = BatchOperation(request)
+
+        # Only merged into the last request : merging into an older one would move the update before the
+        # requests queued in between, which can set the same rows / columns differently.
+        if 'updateDimensionProperties' in request and self._requests:
+            pending = self._requests[-1]
+            if 'updateDimensionProperties' in pending[0] \
+                    and self._merge(pending[0]['updateDimensionProperties'], request['updateDimensionProperties']):
+                pending[1].append(operation)
+                return operation
+
+        self._requests.append((copy.deepcopy(request), [operation]))
+        return operation
+
+    def protect(self, sheet_id, warningOnly, requestingUserCanEdit, UsersList=None, position=None):
+        """
+        Queue the protection of a range or a sheet, cf protect_spreadsheet_element.
+        """
+        return self.add(_protect_request(sheet_id, warningOnly, requestingUserCanEdit, UsersList or [], position))
+
+    def hide_columns(self, sheet_id, start_index, end_index, hiddenByUser=True):
+        """
+        Queue hiding (or showing) of the columns from 'start_index' (included) to 'end_index' (excluded).
+        The first column (A) has the index 0.
+        """
+        return self.add(_hide_columns_request(sheet_id, start_index, end_index, hiddenByUser))
+
+    def hide_column(self, sheet_id, column_index, hiddenByUser=True):
+        """
+        Queue hiding (or showing) of one column, cf hide_spreadsheet_column.
+        """
+        return self.hide_columns(sheet_id, column_index, column_index + 1, hiddenByUser)
+
+    def add_sheet(self, sheet_name, column_nb, row_nb):
+        """
+        Queue the creation of a sheet, cf add_spreadsheet_sheet.
+        """
+        return self.add(_add_sheet_request(sheet_name, column_nb, row_nb))
+
+    def __len__(self):
+        return len(self._requests)
+
+    def flush(self):
+        """
+        Send every queued request in one batchUpdate call, set the reply of each operation
+        and return the response (None if nothing was queued).
+        """
+        if not self._requests:
+            return None
+
+        requests, self._requests = self._requests, []
+        body = {'requests': [request for request, _ in requests]}
+        try:
+            response = execute(self.service.spreadsheets().batchUpdate(spreadsheetId=self.spreadsheet_id,
+                                                                       body=body))
+        except errors.HttpError as error:
+            raise error
+
+        for (_, operations), reply in zip(requests, response.get('replies', [])):
+            for operation in operations:
+                operation.reply = reply
+        return response
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    @staticmethod
+    def _merge(pending, update):
+        """
+        Extend the range of 'pending' (updateDimensionProperties) to cover 'update' if both set the same
+        properties on adjacent or overlapping ranges of the same dimension. Return True if merged.
+        """
+        pending_range = pending['range']
+        update_range = update['range']
+        if (pending_range.get('sheetId') != update_range.get('sheetId')
+                or pending_range.get('dimension') != update_range.get('dimension')
+                or pending.get('properties') != update.get('properties')
+                or pending.get('fields') != update.get('fields')
+                or 'startIndex' not in pending_range or 'endIndex' not in pending_range
+                or 'startIndex' not in update_range or 'endIndex' not in update_range):
+            return False
+        if update_range['startIndex'] > pending_range['endIndex'] \
+                or update_range['endIndex'] < pending_range['startIndex']:
+            return False
+        pending_range['startIndex'] = min(pending_range['startIndex'], update_range['startIndex'])
+        pending_range['endIndex'] = max(pending_range['endIndex'], update_range['endIndex'])
+        return True
+
+
+# Markers put in the queue of a SpreadsheetAppender
+_FLUSH = object()
+_CLOSE = object()
+
+
+class SpreadsheetAppender(object):
+    """
+    Append rows at the end of a table of a spreadsheet (values.append) from a background thread.
+    append() only queues the row in memory : rows are sent by groups of up to 'max_rows' rows, at least every
+    'max_delay' seconds, so that many small writes become a few large ones.
+    When 'max_queue' rows are waiting, append() blocks until there is room again (backpressure).
+        with SpreadsheetAppender(service, spreadsheet_id, "Events!A1") as appender:
+            appender.append([timestamp, user, event])
+    close() (or the end of the 'with' block) sends the remaining rows. An error of a call (API error, connection
+    error, value that cannot be sent...) is raised by the next flush() or close() ; the rows of the failed call
+    are lost.
+    """
+
+    def __init__(self, service, spreadsheet_id, range_, value_input_option='RAW', max_rows=500, max_delay=5.0,
+                 max_queue=10000):
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.range_ = range_
+        self.value_input_option = value_input_option
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._errors = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="SpreadsheetAppender")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def append(self, row, timeout=None):
+        """
+        Queue 'row' (list of values). Blocks while the queue is full ; raises queue.Full
+        if there is still no room after 'timeout' seconds.
+        """
+        if self._closed:
+            raise ValueError("append() on a closed SpreadsheetAppender")
+        self._queue.put([_to_cell(value) for value in row], timeout=timeout)
+
+    def flush(self):
+        """
+        Send the queued rows now and wait until they are written.
+        """
+        if not self._closed:
+            self._queue.put(_FLUSH)
+            self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """
+        Send the queued rows and stop the background thread.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_CLOSE)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _raise_error(self):
+        if self._errors:
+            raise self._errors.pop(0)
+
+    def _run(self):
+        http = thread_http(self.service)
+        running = True
+        while running:
+            rows = []
+            items = 1
+            item = self._queue.get()
+            deadline = time.time() + self.max_delay
+            while item is not _FLUSH and item is not _CLOSE:
+                rows.append(item)
+                if len(rows) >= self.max_rows:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.time()))
+                except queue.Empty:
+                    break
+                items += 1
+            running = item is not _CLOSE
+
+            try:
+                if rows:
+                    self._send(rows, http)
+            finally:
+                # Always acknowledged, so that flush() and append() never wait for a dead thread
+                for _ in range(items):
+                    self._queue.task_done()
+
+    def _send(self, rows, http):
+        try:
+            request = self.service.spreadsheets().values().append(spreadsheetId=self.spreadsheet_id,
+                                                                  range=self.range_,
+                                                                  valueInputOption=self.value_input_option,
+                                                                  insertDataOption='INSERT_ROWS',
+                                                                  body={'values': rows})
+            execute(request, http=http)
+        except Exception as error:
+            # Not only errors.HttpError : values that cannot be serialized, connection errors...
+            self._errors.append(error)
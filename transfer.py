@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# coding: utf8
+
+from __future__ import print_function
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from apiclient import errors
+from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
+
+import metrics
+from execution import MAX_RETRIES, backoff_delay, current_limiter, is_rate_limited, is_retryable, thread_http
+
+# Size of the chunks sent or received by each request. Must be a multiple of 256 KB.
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _next_chunk(request_or_downloader, limiter, **kwargs):
+    """
+    Call next_chunk() on an upload request or a MediaIoBaseDownload, retrying throttled
+    calls and 5xx errors like execution.execute. A failed chunk is sent again from the last
+    offset acknowledged by the server.
+    """
+    start = time.time()
+    retry = 0
+    status = None
+    try:
+        while True:
+            limiter.acquire()
+            try:
+                result = request_or_downloader.next_chunk(**kwargs)
+            except errors.HttpError as error:
+                status = error.resp.status
+                if is_rate_limited(error):
+                    limiter.throttled()
+                if retry >= MAX_RETRIES or not is_retryable(error):
+                    raise error
+                time.sleep(backoff_delay(retry))
+                retry += 1
+                continue
+            status = 200
+            limiter.succeeded()
+            return result
+    finally:
+        if metrics.has_hooks():
+            request = getattr(request_or_downloader, '_request', request_or_downloader)
+            metrics.record("{}.chunk".format(getattr(request, 'methodId', None)), start, time.time() - start,
+                           0, retry, status)
+
+
+def upload_file(service, source, name=None, parent_id=None, mimetype=None, file_id=None,
+                chunk_size=DEFAULT_CHUNK_SIZE, state=None, progress=None, http=None, limiter=None, modified_time=None):
+    """
+    Upload the content of 'source' (path or binary file-like object) to GDRIVE through a resumable
+    upload session, 'chunk_size' bytes per request : the file is never loaded entirely in memory.
+    - name, parent_id : name and parent folder of the new file (name defaults to the file name of 'source')
+    - mimetype : mimeType of the content, application/octet-stream by default
+    - file_id : if given, the content of this existing file is replaced instead of creating a new file
+    - state : optional dict updated after each chunk with the session ("resumable_uri") and the number of bytes
+    acknowledged by the server ("offset"). Persist it (in 'progress' for example) and give it back to continue an
+    interrupted upload from the last acknowledged offset instead of starting over.
+    - progress : optional function called with 'state' after each chunk
+    - modified_time : modifiedTime (RFC 3339) of the file, instead of the time of the upload
+    Returns the created or updated file.
+    """
+    limiter = current_limiter(limiter)
+    state = state if state is not None else {}
+    close = isinstance(source, str)
+    stream = io.open(source, 'rb') if close else source
+
+    try:
+        media = MediaIoBaseUpload(stream, mimetype or 'application/octet-stream',
+                                  chunksize=chunk_size, resumable=True)
+        body = {'modifiedTime': modified_time} if modified_time else {}
+        if file_id:
+            request = service.files().update(fileId=file_id, body=body or None, media_body=media)
+        else:
+            body['name'] = name or os.path.basename(getattr(stream, 'name', 'untitled'))
+            if parent_id:
+                body['parents'] = [parent_id]
+            request = service.files().create(body=body, media_body=media)
+
+        if state.get('resumable_uri'):
+            # The server is asked for the acknowledged offset before sending the next chunk
+            request.resumable_uri = state['resumable_uri']
+            request._in_error_state = True
+
+        response = None
+        while response is None:
+            try:
+                _, response = _next_chunk(request, limiter, http=http)
+            except errors.HttpError as error:
+                if error.resp.status not in (404, 410) or not state.get('resumable_uri'):
+                    raise error
+                # Expired session : start a new one from the beginning
+                request.resumable_uri = None
+                request.resumable_progress = 0
+                request._in_error_state = False
+                state.clear()
+                continue
+
+            state['resumable_uri'] = request.resumable_uri
+            state['offset'] = request.resumable_progress if response is None else media.size()
+            if progress is not None:
+                progress(state)
+
+        return response
+    finally:
+        if close:
+            stream.close()
+
+
+def download_file(service, file_id, destination, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, http=None,
+                  limiter=None):
+    """
+    Download the content of 'file_id' into 'destination' (path or binary file-like object),
+    'chunk_size' bytes per request : the file is never loaded entirely in memory.
+    The download starts at the current position of 'destination' : if 'destination' is the path of a partially
+    downloaded file, the download continues from its end (nothing is downloaded if it is complete).
+    Google documents (Docs, Sheets...) must be exported instead.
+    - progress : optional function called with the number of bytes downloaded after each chunk
+    Returns the number of bytes of the file.
+    """
+    limiter = current_limiter(limiter)
+    close = isinstance(destination, str)
+    stream = io.open(destination, 'ab') if close else destination
+
+    try:
+        request = service.files().get_media(fileId=file_id)
+        if http is not None:
+            request.http = http
+        downloader = MediaIoBaseDownload(stream, request, chunksize=chunk_size)
+        downloader._progress = stream.tell()
+
+        done = False
+        status = None
+        while not done:
+            try:
+                status, done = _next_chunk(downloader, limiter)
+            except errors.HttpError as error:
+                # Nothing left to download after the current position : 'destination' is already complete
+                if error.resp.status != 416 \
+                        or error.resp.get('content-range', '').rpartition('/')[2] != str(downloader._progress):
+                    raise error
+                return downloader._progress
+            if progress is not None:
+                progress(status.resumable_progress)
+
+        return status.resumable_progress
+    finally:
+        if close:
+            stream.close()
+
+
+def _transfer_all(function, service, items, max_workers):
+    def run(kwargs):
+        # Any error (HTTP, connection, local file...) is reported for its item only
+        try:
+            return function(service, http=thread_http(service), **kwargs), None
+        except Exception as error:
+            return None, error
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, items))
+
+
+def upload_files(service, items, max_workers=4):
+    """
+    Upload several files concurrently.
+    - items : iterable of dicts of upload_file arguments (without 'service'),
+    for example [{"source": "/tmp/a.csv", "parent_id": folder_id}, ...]
+    Returns a list of (response, error) tuples in the same order as 'items',
+    'error' being the exception raised by the upload (errors.HttpError, IOError...) or None.
+    """
+    return _transfer_all(upload_file, service, items, max_workers)
+
+
+def download_files(service, items, max_workers=4):
+    """
+    Download several files concurrently.
+    - items : iterable of dicts of download_file arguments (without 'service'),
+    for example [{"file_id": file_id, "destination": "/tmp/a.csv"}, ...]
+    Returns a list of (size, error) tuples in the same order as 'items',
+    'error' being the exception raised by the download (errors.HttpError, IOError...) or None.
+    """
+    return _transfer_all(download_file, service, items, max_workers)